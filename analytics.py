@@ -0,0 +1,269 @@
+# analytics.py
+"""
+Столбцовый движок аналитики на NumPy.
+
+Операции профиля один раз загружаются в массивы (id, номер дня, категория,
+признак дохода, сумма в копейках; операции без категории получают
+UNCATEGORIZED_ID), после чего сводки, группировки по категориям и дням,
+скользящие суммы, сравнение периодов и топ категорий считаются векторно,
+без запросов к базе. Изменения отдельных операций
+применяются к массивам на месте (apply_change); любое другое изменение
+версии данных профиля приводит к полной перезагрузке при следующем обращении.
+
+Результаты имеют тот же формат, что и у StatsService: суммы — в копейках,
+даты — номера дней, диапазоны — полуоткрытые [start_day, end_day).
+"""
+import importlib.util
+from repository import UNCATEGORIZED_ID
+
+# NumPy импортируется при создании первого движка, а не при загрузке модуля:
+# импорт занимает заметное время и не нужен до открытия статистики
+np = None
+
+INCOME = "Доход"
+EXPENSE = "Расход"
+# Номер дня 01.01.1970 — начала отсчёта datetime64 в NumPy
+EPOCH_DAY = 719163
+
+
+def available():
+    """Установлен ли NumPy; без него StatsService считает сводки запросами SQL."""
+    return np is not None or importlib.util.find_spec("numpy") is not None
+
+
+def load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+class ProfileAnalytics:
+    def __init__(self, db, profile_id):
+        if not available():
+            raise RuntimeError("Для аналитики требуется NumPy")
+        load_numpy()
+        self.db = db
+        self.profile_id = profile_id
+        self.categories = db.category_cache(profile_id)
+        self.version = None  # версия данных, которой соответствуют массивы
+        self.reloads = 0
+        self._clear()
+
+    def _clear(self):
+        # Массивы упорядочены по id: новые операции получают наибольший id и дописываются в конец
+        self.ids = np.empty(0, dtype=np.int64)
+        self.days = np.empty(0, dtype=np.int64)
+        self.category_ids = np.empty(0, dtype=np.int64)
+        self.income = np.empty(0, dtype=bool)
+        self.amounts = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def load(self):
+        """Полностью перечитывает операции профиля."""
+        version = self.db.data_version(self.profile_id)
+        with self.db.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, day, COALESCE(category_id, ?), type = ?, amount FROM transactions "
+                "WHERE profile_id = ? ORDER BY id",
+                (UNCATEGORIZED_ID, INCOME, self.profile_id)
+            ).fetchall()
+        if rows:
+            data = np.array(rows, dtype=np.int64)
+            self.ids = data[:, 0].copy()
+            self.days = data[:, 1].copy()
+            self.category_ids = data[:, 2].copy()
+            self.income = data[:, 3].astype(bool)
+            self.amounts = data[:, 4].copy()
+        else:
+            self._clear()
+        self.version = version
+        self.reloads += 1
+
+    def refresh(self):
+        """Перезагружает массивы, если данные профиля изменились мимо apply_change."""
+        if self.version != self.db.data_version(self.profile_id):
+            self.load()
+
+    def apply_change(self, change):
+        """
+        Применяет TransactionChange к массивам. Изменение учитывается, только
+        если после загрузки данных это единственная запись; иначе массивы
+        помечаются устаревшими и перечитываются при следующем обращении.
+        """
+        version = self.db.data_version(self.profile_id)
+        if self.version is None or version != (self.version[0], self.version[1] + 1):
+            self.version = None
+            return False
+        if change.old is not None:
+            self._remove(change.old[0])
+        if change.new is not None:
+            self._insert(change.new)
+        self.version = version
+        return True
+
+    def _remove(self, transaction_id):
+        index = np.searchsorted(self.ids, transaction_id)
+        if index < len(self.ids) and self.ids[index] == transaction_id:
+            self.ids = np.delete(self.ids, index)
+            self.days = np.delete(self.days, index)
+            self.category_ids = np.delete(self.category_ids, index)
+            self.income = np.delete(self.income, index)
+            self.amounts = np.delete(self.amounts, index)
+
+    def _insert(self, row):
+        transaction_id, day, category_id, _, type_, amount, _ = row
+        index = np.searchsorted(self.ids, transaction_id)
+        self.ids = np.insert(self.ids, index, transaction_id)
+        self.days = np.insert(self.days, index, day)
+        self.category_ids = np.insert(self.category_ids, index, category_id)
+        self.income = np.insert(self.income, index, type_ == INCOME)
+        self.amounts = np.insert(self.amounts, index, amount)
+
+    # Отбор операций
+
+    def _mask(self, start_day, end_day, type_=None):
+        self.refresh()
+        mask = np.ones(len(self.ids), dtype=bool)
+        if start_day is not None:
+            mask &= self.days >= start_day
+        if end_day is not None:
+            mask &= self.days < end_day
+        if type_ == INCOME:
+            mask &= self.income
+        elif type_ == EXPENSE:
+            mask &= ~self.income
+        return mask
+
+    def _category_sums(self, mask):
+        """(id категорий по возрастанию, суммы) для отобранных операций."""
+        category_ids = self.category_ids[mask]
+        if not len(category_ids):
+            return category_ids, np.zeros(0, dtype=np.int64)
+        # id категорий — небольшие целые числа, поэтому группировка сводится к bincount
+        counts = np.bincount(category_ids)
+        sums = np.bincount(category_ids, weights=self.amounts[mask]).astype(np.int64)
+        ids = np.flatnonzero(counts)
+        # Как JOIN categories в SQL: операции без категории (UNCATEGORIZED_ID)
+        # и с неизвестной кэшу категорией в сводки по категориям не входят
+        ids = ids[[self.categories.get(int(category_id)) is not None for category_id in ids]]
+        return ids, sums[ids]
+
+    def _names(self, category_ids):
+        return [self.categories.get(int(category_id))[0] for category_id in category_ids]
+
+    # Сводки в формате StatsService
+
+    def totals(self, start_day, end_day):
+        """(доходы, расходы) за период."""
+        mask = self._mask(start_day, end_day)
+        amounts = self.amounts[mask]
+        income = self.income[mask]
+        return int(amounts[income].sum()), int(amounts[~income].sum())
+
+    def by_category(self, start_day, end_day, type_=None):
+        """{"names": [...], "amounts": [...]} в порядке id категорий, как GROUP BY c.id."""
+        ids, sums = self._category_sums(self._mask(start_day, end_day, type_))
+        return {"names": self._names(ids), "amounts": sums.tolist()}
+
+    def daily(self, start_day, end_day):
+        """{"days": [...], "income": [...], "expense": [...]} по дням с операциями."""
+        mask = self._mask(start_day, end_day)
+        days = self.days[mask]
+        if not len(days):
+            return {"days": [], "income": [], "expense": []}
+        first = days.min()
+        offsets = days - first
+        amounts = self.amounts[mask]
+        income = self.income[mask]
+        counts = np.bincount(offsets)
+        income_sums = np.bincount(offsets, weights=np.where(income, amounts, 0), minlength=len(counts))
+        expense_sums = np.bincount(offsets, weights=np.where(income, 0, amounts), minlength=len(counts))
+        present = np.flatnonzero(counts)
+        return {
+            "days": (present + first).tolist(),
+            "income": income_sums[present].astype(np.int64).tolist(),
+            "expense": expense_sums[present].astype(np.int64).tolist(),
+        }
+
+    def buckets(self, start_day, end_day, unit):
+        """
+        {"buckets": [...], "income": [...], "expense": [...]} по интервалам unit с операциями;
+        номера интервалов те же, что у services.bucket_index.
+        """
+        mask = self._mask(start_day, end_day)
+        amounts = self.amounts[mask]
+        income = self.income[mask]
+        buckets, positions = np.unique(self._bucket_indexes(self.days[mask], unit), return_inverse=True)
+        income_sums = np.bincount(positions, weights=np.where(income, amounts, 0), minlength=len(buckets))
+        expense_sums = np.bincount(positions, weights=np.where(income, 0, amounts), minlength=len(buckets))
+        return {
+            "buckets": buckets.tolist(),
+            "income": income_sums.astype(np.int64).tolist(),
+            "expense": expense_sums.astype(np.int64).tolist(),
+        }
+
+    @staticmethod
+    def _bucket_indexes(days, unit):
+        if unit == "day":
+            return days
+        if unit == "week":
+            return (days - 1) // 7
+        # Номер месяца год * 12 + месяц - 1; кварталы и годы получаются делением
+        months = (days - EPOCH_DAY).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) + 1970 * 12
+        if unit == "month":
+            return months
+        if unit == "quarter":
+            return months // 3
+        if unit == "year":
+            return months // 12
+        raise ValueError(f"Неизвестный интервал группировки: {unit}")
+
+    # Аналитика
+
+    def rolling_sums(self, start_day, end_day, window, type_=EXPENSE):
+        """
+        Скользящие суммы за window дней по каждому дню периода:
+        {"days": [...], "sums": [...]}. Операции до start_day учитываются
+        в первых окнах, поэтому значения не зависят от начала периода.
+        """
+        first = start_day - window + 1
+        mask = self._mask(first, end_day, type_)
+        per_day = np.bincount(self.days[mask] - first, weights=self.amounts[mask],
+                              minlength=end_day - first).astype(np.int64)
+        cumulative = np.concatenate(([0], np.cumsum(per_day)))
+        sums = cumulative[window:] - cumulative[:-window]
+        return {"days": list(range(start_day, end_day)), "sums": sums.tolist()}
+
+    def compare(self, current, previous, type_=EXPENSE):
+        """
+        Сравнение двух периодов (пары (start_day, end_day)) по категориям:
+        {"names", "current", "previous", "change"}; категории, встречающиеся
+        хотя бы в одном периоде, в порядке id.
+        """
+        current_ids, current_sums = self._category_sums(self._mask(*current, type_))
+        previous_ids, previous_sums = self._category_sums(self._mask(*previous, type_))
+        ids = np.union1d(current_ids, previous_ids)
+        current_all = np.zeros(len(ids), dtype=np.int64)
+        previous_all = np.zeros(len(ids), dtype=np.int64)
+        current_all[np.searchsorted(ids, current_ids)] = current_sums
+        previous_all[np.searchsorted(ids, previous_ids)] = previous_sums
+        return {
+            "names": self._names(ids),
+            "current": current_all.tolist(),
+            "previous": previous_all.tolist(),
+            "change": (current_all - previous_all).tolist(),
+        }
+
+    def top_categories(self, start_day, end_day, count, type_=EXPENSE):
+        """count категорий с наибольшими суммами: {"names": [...], "amounts": [...]} по убыванию."""
+        ids, sums = self._category_sums(self._mask(start_day, end_day, type_))
+        if count < len(sums):
+            top = np.argpartition(-sums, count - 1)[:count]
+        else:
+            top = np.arange(len(sums))
+        top = top[np.argsort(-sums[top], kind="stable")]
+        return {"names": self._names(ids[top]), "amounts": sums[top].tolist()}
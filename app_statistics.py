@@ -1,15 +1,27 @@
 # app_statistics.py
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QLabel,
-                             QPushButton, QFileDialog, QMessageBox, QDateEdit, QSizePolicy)
-from PyQt5.QtCore import Qt, QDate, QDateTime
-from PyQt5.QtChart import QChart, QPieSeries, QBarCategoryAxis, QValueAxis, QChartView, QBarSeries, QBarSet
+                             QPushButton, QFileDialog, QMessageBox, QDateEdit, QSizePolicy, QProgressDialog)
+from PyQt5.QtCore import Qt, QDate
+from PyQt5.QtChart import QChartView
 from PyQt5 import QtGui
 from PyQt5.QtGui import QFont
-import sqlite3
-import csv
-import openpyxl
 from datetime import datetime
-from dateutil.relativedelta import relativedelta
+from services import (StatsService, adjust_totals, adjust_by_category, adjust_buckets,
+                      choose_bucket, bucket_label)
+from units import from_kopecks
+from periods import PeriodFilter, STATISTICS_PERIODS
+from charts import ChartController
+from exporters import export_transactions
+from workers import ExportWorker
+
+# Подписи оси X гистограммы для интервалов группировки
+BUCKET_TITLES = {
+    "day": "По дням",
+    "week": "По неделям",
+    "month": "По месяцам",
+    "quarter": "По кварталам",
+    "year": "По годам",
+}
 
 
 class StatisticsTab(QWidget):
@@ -17,6 +29,13 @@ class StatisticsTab(QWidget):
         super().__init__()
         self.db = db
         self.profile_id = profile_id
+        self.stats = StatsService(db)
+        # Последние загруженные итоги и данные диаграммы с их периодом
+        self.totals = (0, 0)
+        self.totals_range = None
+        self.chart_data = None
+        self.export_worker = None
+        self.export_dialog = None
         self.init_ui()
 
     def init_ui(self):
@@ -176,6 +195,7 @@ class StatisticsTab(QWidget):
         self.chart_view = QChartView()
         self.chart_view.setRenderHint(QtGui.QPainter.Antialiasing)
         self.chart_view.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.charts = ChartController(self.chart_view)
 
         chart_container = QWidget()
         chart_container.setLayout(QVBoxLayout())
@@ -193,10 +213,9 @@ class StatisticsTab(QWidget):
         try:
             print("update_all called")  # Отладка
             self.update_statistics()
-            current_chart = self.chart_view.chart()
-            if current_chart and current_chart.title() == "Распределение по категориям":
+            if self.charts.current == "pie":
                 self.show_pie_chart()
-            elif current_chart and current_chart.title() == "Доходы и расходы по датам":
+            elif self.charts.current == "bar":
                 self.show_bar_chart_income_expense()
 
             # Управление видимостью дат для произвольного периода
@@ -208,61 +227,64 @@ class StatisticsTab(QWidget):
             print(f"Ошибка в update_all: {e}")
             QMessageBox.warning(self, "Ошибка", f"Не удалось обновить статистику: {e}")
 
+    def get_period_range(self):
+        """Возвращает полуоткрытый диапазон номеров дней [начало, конец) для выбранного периода"""
+        return PeriodFilter.from_label(
+            self.period_combo.currentText(), STATISTICS_PERIODS,
+            self.date_from.date().toPyDate(), self.date_to.date().toPyDate()
+        ).bounds()
+
     def update_statistics(self):
         try:
-            period = self.period_combo.currentText()
-            query = (
-                "SELECT SUM(CASE WHEN [type] = 'Доход' THEN amount ELSE 0 END) as income, "
-                "SUM(CASE WHEN [type] = 'Расход' THEN amount ELSE 0 END) as expense "
-                "FROM transactions WHERE profile_id = ?"
-            )
-            params = [self.profile_id]
-            today = datetime.now()
-            print(f"update_statistics - Today: {today}, Period: {period}")  # Отладка
-            if period == "Текущий месяц":
-                query += " AND date LIKE ?"
-                params.append(f"{today.strftime('%Y-%m')}%")
-            elif period == "Прошлый месяц":
-                year = today.year
-                month = today.month
-                if month == 1:
-                    year -= 1
-                    month = 12
-                else:
-                    month -= 1
-                last_month = today.replace(year=year, month=month)
-                print(f"update_statistics - Last month: {last_month}")  # Отладка
-                query += " AND date LIKE ?"
-                params.append(f"{last_month.strftime('%Y-%m')}%")
-            elif period == "Год":
-                query += " AND date LIKE ?"
-                params.append(f"{today.strftime('%Y')}%")
-            elif period == "Произвольный":
-                query += " AND date BETWEEN ? AND ?"
-                params.extend(
-                    [self.date_from.date().toString("yyyy-MM-dd"), self.date_to.date().toString("yyyy-MM-dd")])
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                result = cursor.fetchone()
-                print(f"update_statistics - Result: {result}")  # Отладка
-                if result:
-                    income, expense = result
-                    income = float(income or 0)
-                    expense = float(expense or 0)
-                    balance = income - expense
-                    self.balance_label.setText(f"💰 Общий баланс: {balance:.2f} ₽")
-                    self.income_label.setText(f"🟢 Доходы: {income:.2f} ₽")
-                    self.expense_label.setText(f"🔴 Расходы: {expense:.2f} ₽")
-                else:
-                    self.balance_label.setText("💰 Общий баланс: 0.00 ₽")
-                    self.income_label.setText("🟢 Доходы: 0.00 ₽")
-                    self.expense_label.setText("🔴 Расходы: 0.00 ₽")
+            start_day, end_day = self.get_period_range()
+            print(f"update_statistics - Period: {self.period_combo.currentText()}, Days: {start_day}-{end_day}")  # Отладка
+            self.totals = self.stats.totals(self.profile_id, start_day, end_day)
+            self.totals_range = (start_day, end_day)
+            print(f"update_statistics - Result: {self.totals}")  # Отладка
+            self.show_totals()
         except Exception as e:
             print(f"Ошибка в update_statistics: {e}")
             raise  # Передаем ошибку для диагностики
 
-    def show_pie_chart(self):
+    def show_totals(self):
+        income = from_kopecks(self.totals[0])
+        expense = from_kopecks(self.totals[1])
+        balance = income - expense
+        self.balance_label.setText(f"💰 Общий баланс: {balance:.2f} ₽")
+        self.income_label.setText(f"🟢 Доходы: {income:.2f} ₽")
+        self.expense_label.setText(f"🔴 Расходы: {expense:.2f} ₽")
+
+    def apply_change(self, change):
+        """
+        Учитывает изменение одной операции без повторных запросов:
+        итоги и данные текущей диаграммы пересчитываются арифметически.
+        """
+        self.stats.apply_change(self.profile_id, change)
+        start_day, end_day = self.get_period_range()
+        if self.totals_range != (start_day, end_day):
+            self.update_all()
+            return
+        self.totals = adjust_totals(self.totals, change, start_day, end_day)
+        self.show_totals()
+        chart_key = (start_day, end_day, self.type_combo.currentText())
+        if self.charts.current == "pie":
+            if self.chart_data is not None and self.chart_data[0] == ("pie",) + chart_key:
+                adjust_by_category(self.chart_data[1], change, start_day, end_day, chart_key[2])
+                self.show_pie_chart(self.chart_data[1])
+            else:
+                self.show_pie_chart()
+        elif self.charts.current == "bar":
+            if self.chart_data is not None and self.chart_data[0] == ("bar", start_day, end_day):
+                adjust_buckets(self.chart_data[1], change, start_day, end_day, choose_bucket(start_day, end_day))
+                self.show_bar_chart_income_expense(self.chart_data[1])
+            else:
+                self.show_bar_chart_income_expense()
+
+    def track_change(self, change):
+        """Для скрытой вкладки: изменение учитывается только в данных StatsService, экран обновится при показе."""
+        self.stats.apply_change(self.profile_id, change)
+
+    def show_pie_chart(self, result=None):
         try:
             # Сохраняем текущий выбор перед очисткой
             current_type = self.type_combo.currentText()
@@ -278,89 +300,25 @@ class StatisticsTab(QWidget):
             self.type_combo.setEnabled(True)
             self.type_combo.blockSignals(False)
 
-            series = QPieSeries()
             period = self.period_combo.currentText()
             type_filter = self.type_combo.currentText()
             print(f"Pie chart - Period: {period}, Type: {type_filter}")  # Отладка
-            query = (
-                "SELECT c.name, SUM(t.amount) "
-                "FROM transactions t JOIN categories c ON t.category_id = c.id "
-                "WHERE t.profile_id = ?"
-            )
-            params = [self.profile_id]
-            today = datetime.now()
-            if period == "Текущий месяц":
-                query += " AND t.date LIKE ?"
-                params.append(f"{today.strftime('%Y-%m')}%")
-            elif period == "Прошлый месяц":
-                # Вычисляем прошлый месяц вручную
-                year = today.year
-                month = today.month
-                if month == 1:
-                    year -= 1
-                    month = 12
-                else:
-                    month -= 1
-                last_month = today.replace(year=year, month=month)
-                query += " AND t.date LIKE ?"
-                params.append(f"{last_month.strftime('%Y-%m')}%")
-            elif period == "Год":
-                query += " AND t.date LIKE ?"
-                params.append(f"{today.strftime('%Y')}%")
-            elif period == "Произвольный":
-                query += " AND t.date BETWEEN ? AND ?"
-                params.extend(
-                    [self.date_from.date().toString("yyyy-MM-dd"), self.date_to.date().toString("yyyy-MM-dd")])
-            if type_filter == "Доходы":
-                query += " AND t.[type] = 'Доход'"
-            elif type_filter == "Расходы":
-                query += " AND t.[type] = 'Расход'"
-            query += " GROUP BY c.id"
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                data = cursor.fetchall()
-                print(f"Pie chart data: {data}")  # Отладка
-                if not data:
-                    QMessageBox.information(self, "Информация", "Нет данных для отображения")
-                    return
-                total = sum(row[1] for row in data)
-                colors = [QtGui.QColor(c) for c in [
-                    '#FF6384',  # Розовый
-                    '#36A2EB',  # Синий
-                    '#FFCE56',  # Желтый
-                    '#4BC0C0',  # Бирюзовый
-                    '#9966FF',  # Фиолетовый
-                    '#FF9F40',  # Оранжевый
-                    '#7BE041',  # Зеленый
-                    '#FF6F61',  # Коралловый
-                    '#6B5B95',  # Темно-фиолетовый
-                    '#88B04B',  # Оливковый
-                    '#F7CAC9',  # Светло-розовый
-                ]]
-                for i, (name, amount) in enumerate(data):
-                    slice_ = series.append(name, amount)
-                    percentage = amount / total * 100
-                    if percentage >= 2:
-                        slice_.setLabel(f"{name} {percentage:.1f}%")
-                        slice_.setLabelVisible(True)
-                        slice_.setLabelFont(QFont("Arial", 12))
-                    slice_.setColor(colors[i % len(colors)])
-
-            chart = QChart()
-            chart.addSeries(series)
-            chart.setTitle("Распределение по категориям")
-            chart.setTitleFont(QFont("Arial", 16))
-            chart.legend().setVisible(True)
-            chart.legend().setFont(QFont("Arial", 12))
-            chart.setAnimationOptions(QChart.SeriesAnimations)
-            self.chart_view.setChart(chart)
+            start_day, end_day = self.get_period_range()
+            if result is None:
+                result = self.stats.by_category(self.profile_id, start_day, end_day, type_filter)
+            # Сохраняем данные диаграммы, чтобы применять к ним изменения операций
+            self.chart_data = (("pie", start_day, end_day, type_filter), result)
+            data = [(name, from_kopecks(amount)) for name, amount in zip(result["names"], result["amounts"])]
+            print(f"Pie chart data: {data}")  # Отладка
+            if not data:
+                QMessageBox.information(self, "Информация", "Нет данных для отображения")
+                return
+            self.charts.show_pie([row[0] for row in data], [row[1] for row in data])
         except Exception as e:
             print(f"Ошибка в show_pie_chart: {e}")
             QMessageBox.warning(self, "Ошибка", f"Не удалось отобразить круговую диаграмму: {e}")
 
-
-    def show_bar_chart_income_expense(self):
+    def show_bar_chart_income_expense(self, result=None):
         try:
             print("show_bar_chart_income_expense called")  # Отладка
             # Отключаем сигналы, чтобы избежать рекурсии
@@ -372,188 +330,105 @@ class StatisticsTab(QWidget):
             self.type_combo.blockSignals(False)
 
             period = self.period_combo.currentText()
-            query = (
-                "SELECT t.date, "
-                "SUM(CASE WHEN [type] = 'Доход' THEN amount ELSE 0 END) as income, "
-                "SUM(CASE WHEN [type] = 'Расход' THEN amount ELSE 0 END) as expense "
-                "FROM transactions t WHERE t.profile_id = ?"
-            )
-            params = [self.profile_id]
-            today = datetime.now()
             print(f"Bar chart - Period: {period}, Profile ID: {self.profile_id}")  # Отладка
-            if period == "Текущий месяц":
-                query += " AND t.date LIKE ?"
-                params.append(f"{today.strftime('%Y-%m')}%")
-            elif period == "Прошлый месяц":
-                year = today.year
-                month = today.month
-                if month == 1:
-                    year -= 1
-                    month = 12
-                else:
-                    month -= 1
-                last_month = today.replace(year=year, month=month)
-                query += " AND t.date LIKE ?"
-                params.append(f"{last_month.strftime('%Y-%m')}%")
-            elif period == "Год":
-                query += " AND t.date LIKE ?"
-                params.append(f"{today.strftime('%Y')}%")
-            elif period == "Произвольный":
-                query += " AND t.date BETWEEN ? AND ?"
-                params.extend(
-                    [self.date_from.date().toString("yyyy-MM-dd"), self.date_to.date().toString("yyyy-MM-dd")])
-            query += " GROUP BY t.date ORDER BY t.date"
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                data = cursor.fetchall()
-                print(f"Bar chart data: {data}")  # Отладка
-                if not data:
-                    print("No data returned from query")  # Отладка
-                    QMessageBox.information(self, "Информация", "Нет данных для отображения гистограммы")
-                    chart = QChart()
-                    chart.setTitle("Доходы и расходы по датам")
-                    chart.setTitleFont(QFont("Arial", 16))
-                    axis_x = QBarCategoryAxis()
-                    axis_x.setLabelsFont(QFont("Arial", 10))
-                    chart.addAxis(axis_x, Qt.AlignBottom)
-                    axis_y = QValueAxis()
-                    axis_y.setLabelFormat("%.2f ₽")
-                    axis_y.setTitleText("Сумма (₽)")
-                    axis_y.setTitleFont(QFont("Arial", 12))
-                    axis_y.setRange(0, 1000)
-                    axis_y.setLabelsFont(QFont("Arial", 10))
-                    chart.addAxis(axis_y, Qt.AlignLeft)
-                    self.chart_view.setChart(chart)
-                    return
-
-            # Фильтруем данные, исключая даты с нулевыми значениями
+            start_day, end_day = self.get_period_range()
+            # Столбцы группируются по дням, неделям, месяцам и т. д., чтобы их число не превышало services.MAX_BARS;
+            # суммы по интервалам считает StatsService, вкладка получает не больше строк, чем столбцов
+            unit = choose_bucket(start_day, end_day)
+            if result is None:
+                result = self.stats.buckets(self.profile_id, start_day, end_day, unit)
+            self.chart_data = (("bar", start_day, end_day), result)
+            data = list(zip(result["starts"], result["income"], result["expense"]))
+            print(f"Bar chart data ({unit}): {data}")  # Отладка
+            if not data:
+                print("No data returned from query")  # Отладка
+                QMessageBox.information(self, "Информация", "Нет данных для отображения гистограммы")
+                self.charts.show_bars([], [], [])
+                return
+
+            # Фильтруем данные, исключая интервалы с нулевыми значениями
             filtered_data = [(d, i, e) for d, i, e in data if i > 0 or e > 0]
             if not filtered_data:
                 print("No non-zero data after filtering")  # Отладка
                 QMessageBox.information(self, "Информация", "Нет ненулевых данных для отображения")
                 return
-            dates = [row[0] for row in filtered_data]
-            incomes = [float(row[1]) for row in filtered_data]
-            expenses = [float(row[2]) for row in filtered_data]
-            print(f"Filtered Dates: {dates}, Incomes: {incomes}, Expenses: {expenses}")  # Отладка
+            days = [row[0] for row in filtered_data]
+            incomes = [from_kopecks(row[1]) for row in filtered_data]
+            expenses = [from_kopecks(row[2]) for row in filtered_data]
+            print(f"Filtered Days: {days}, Incomes: {incomes}, Expenses: {expenses}")  # Отладка
 
             # Форматируем даты для категорий
-            categories = [QDateTime.fromString(d, "yyyy-MM-dd").toString("dd.MM") for d in dates]
+            categories = [bucket_label(d, unit) for d in days]
             print(f"Categories: {categories}")  # Отладка
 
-            # Создаем наборы данных
-            income_set = QBarSet("Доходы")
-            expense_set = QBarSet("Расходы")
-            income_set.setColor(QtGui.QColor("green"))
-            expense_set.setColor(QtGui.QColor("red"))
-            income_set.append(incomes)
-            expense_set.append(expenses)
-
-            # Создаем серию (без накопления)
-            series = QBarSeries()
-            series.append(income_set)  # Доходы
-            series.append(expense_set)  # Расходы
-            series.setBarWidth(0.35)
-            print(f"Bar series count: {series.count()}")  # Отладка
-
-            # Создаем график
-            chart = QChart()
-            chart.addSeries(series)
-            chart.setTitle("Доходы и расходы по датам")
-            chart.setTitleFont(QFont("Arial", 16))
-            chart.setAnimationOptions(QChart.SeriesAnimations)
-
-            # Настраиваем ось X (категории)
-            axis_x = QBarCategoryAxis()
-            axis_x.append(categories)
-            axis_x.setLabelsFont(QFont("Arial", 10))
-            chart.addAxis(axis_x, Qt.AlignBottom)
-            series.attachAxis(axis_x)
-            print(f"Axis X categories: {axis_x.categories()}")  # Отладка
-
-            # Настраиваем ось Y (суммы)
-            axis_y = QValueAxis()
-            # Пробуем разные шрифты для меток
-            label_font = QFont("Arial Unicode MS", 10)  # Пробуем Times New Roman
-            axis_y.setLabelsFont(label_font)
-            axis_y.setLabelFormat("%.2f ")  # Формат с символом рубля
-            axis_y.setTitleText("Сумма (₽)")
-            axis_y.setTitleFont(QFont("Arial Unicode MS", 12))
-            max_value = max(max(incomes, default=0), max(expenses, default=0)) * 1.2
-            axis_y.setRange(0, max_value if max_value > 0 else 1000)
-            chart.addAxis(axis_y, Qt.AlignLeft)
-            series.attachAxis(axis_y)
-            print(f"Axis Y range: 0 to {axis_y.max()}")  # Отладка
-            print(f"Axis Y label format: {axis_y.labelFormat()}")  # Отладка
-
-            # Настраиваем легенду
-            chart.legend().setVisible(True)
-            chart.legend().setFont(QFont("Arial", 10))
-            chart.legend().setAlignment(Qt.AlignBottom)
-
-            # Устанавливаем график
-            self.chart_view.setChart(chart)
-            self.chart_view.setRenderHint(QtGui.QPainter.Antialiasing)
-            print("Chart set to chart_view")  # Отладка
+            self.charts.show_bars(categories, incomes, expenses, BUCKET_TITLES[unit])
+            print(f"Axis Y range: 0 to {self.charts.axis_y.max()}")  # Отладка
         except Exception as e:
             print(f"Ошибка в show_bar_chart_income_expense: {e}")
             QMessageBox.warning(self, "Ошибка", f"Не удалось отобразить гистограмму: {e}")
 
     def export_data(self, format_):
-        period = self.period_combo.currentText()
         type_filter = self.type_combo.currentText()
-        query = (
-            "SELECT t.date, c.name, t.[type], t.amount, t.description "
-            "FROM transactions t JOIN categories c ON t.category_id = c.id "
-            "WHERE t.profile_id = ?"
-        )
-        params = [self.profile_id]
-        today = datetime.now()
-        if period == "Текущий месяц":
-            query += " AND t.date LIKE ?"
-            params.append(f"{today.strftime('%Y-%m')}%")
-        elif period == "Прошлый месяц":
-            last_month = today - relativedelta(months=1)
-            query += " AND t.date LIKE ?"
-            params.append(f"{last_month.strftime('%Y-%m')}%")
-        elif period == "Год":
-            query += " AND t.date LIKE ?"
-            params.append(f"{today.strftime('%Y')}%")
-        elif period == "Произвольный":
-            query += " AND t.date BETWEEN ? AND ?"
-            params.extend([self.date_from.date().toString("yyyy-MM-dd"), self.date_to.date().toString("yyyy-MM-dd")])
-        if type_filter == "Доходы":
-            query += " AND t.[type] = 'Доход'"
-        elif type_filter == "Расходы":
-            query += " AND t.[type] = 'Расход'"
-        # Для "Доходы и Расходы" не добавляем фильтр по типу
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            data = cursor.fetchall()
-            if not data:
-                QMessageBox.information(self, "Информация", "Нет данных для экспорта")
-                return
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            if format_ == "csv":
-                file_path, _ = QFileDialog.getSaveFileName(self, "Экспорт в CSV", f"transactions_{timestamp}.csv",
-                                                           "CSV Files (*.csv)")
-                if file_path:
-                    with open(file_path, 'w', newline='', encoding='utf-8') as f:
-                        writer = csv.writer(f)
-                        writer.writerow(["Дата", "Категория", "Тип", "Сумма", "Описание"])
-                        writer.writerows(data)
-                    QMessageBox.information(self, "Успех", "Данные экспортированы в CSV")
-            elif format_ == "xlsx":
-                file_path, _ = QFileDialog.getSaveFileName(self, "Экспорт в XLSX", f"transactions_{timestamp}.xlsx",
-                                                           "XLSX Files (*.xlsx)")
-                if file_path:
-                    wb = openpyxl.Workbook()
-                    ws = wb.active
-                    ws.title = "Transactions"
-                    ws.append(["Дата", "Категория", "Тип", "Сумма", "Описание"])
-                    for row in data:
-                        ws.append(row)
-                    wb.save(file_path)
-                    QMessageBox.information(self, "Успех", "Данные экспортированы в XLSX")
\ No newline at end of file
+        start_day, end_day = self.get_period_range()
+        # Для "Доходы и Расходы" фильтр по типу не применяется.
+        # Строки считает фоновый экспорт: если их нет, он завершится с нулём строк
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if format_ == "csv":
+            file_path, _ = QFileDialog.getSaveFileName(self, "Экспорт в CSV", f"transactions_{timestamp}.csv",
+                                                       "CSV Files (*.csv)")
+            if file_path:
+                self.start_export(file_path, format_, start_day, end_day, type_filter)
+        elif format_ == "xlsx":
+            file_path, _ = QFileDialog.getSaveFileName(self, "Экспорт в XLSX", f"transactions_{timestamp}.xlsx",
+                                                       "XLSX Files (*.xlsx)")
+            if file_path:
+                self.start_export(file_path, format_, start_day, end_day, type_filter)
+
+    def start_export(self, file_path, format_, start_day, end_day, type_filter):
+        """Запускает экспорт в фоновом потоке с окном прогресса и кнопкой отмены."""
+        if self.export_worker is None:
+            self.export_worker = ExportWorker(self.db, self)
+            self.export_worker.progress.connect(self.show_export_progress)
+            self.export_worker.finished.connect(self.export_finished)
+            self.export_worker.failed.connect(self.export_failed)
+            self.export_worker.cancelled.connect(self.export_cancelled)
+        self.export_format = format_.upper()
+        self.export_dialog = QProgressDialog(f"Экспорт в {self.export_format}...", "Отмена", 0, 100, self)
+        self.export_dialog.setWindowModality(Qt.WindowModal)
+        self.export_dialog.setMinimumDuration(500)
+        self.export_dialog.canceled.connect(self.export_worker.cancel)
+        self.csv_export_btn.setEnabled(False)
+        self.xlsx_export_btn.setEnabled(False)
+        profile_id = self.profile_id
+        self.export_worker.start(lambda conn, progress, cancelled: export_transactions(
+            conn, file_path, format_, profile_id, start_day, end_day, type_filter,
+            progress=progress, cancelled=cancelled
+        ))
+
+    def show_export_progress(self, done, total):
+        if self.export_dialog is not None and total:
+            self.export_dialog.setValue(done * 100 // total)
+
+    def end_export(self):
+        if self.export_dialog is not None:
+            # Отключаем отмену, чтобы закрытие окна не считалось нажатием «Отмена»
+            self.export_dialog.canceled.disconnect()
+            self.export_dialog.close()
+            self.export_dialog = None
+        self.csv_export_btn.setEnabled(True)
+        self.xlsx_export_btn.setEnabled(True)
+
+    def export_finished(self, count):
+        self.end_export()
+        if not count:
+            QMessageBox.information(self, "Информация", "Нет данных для экспорта")
+            return
+        QMessageBox.information(self, "Успех", f"Данные экспортированы в {self.export_format}")
+
+    def export_failed(self, message):
+        self.end_export()
+        QMessageBox.warning(self, "Ошибка", f"Не удалось экспортировать данные: {message}")
+
+    def export_cancelled(self):
+        self.end_export()
+        QMessageBox.information(self, "Информация", "Экспорт отменён")
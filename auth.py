@@ -1,7 +1,9 @@
 # auth.py
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel, QMessageBox
-from PyQt5.QtCore import QCoreApplication
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QPushButton, QLabel, QMessageBox, QApplication
+from PyQt5.QtCore import QCoreApplication, Qt
 from PyQt5.QtGui import QFont
+from passwords import check_password, hash_password
+from workers import TaskRunner
 
 
 class AuthDialog(QDialog):
@@ -9,6 +11,8 @@ class AuthDialog(QDialog):
         super().__init__()
         self.db = db
         self.profile_id = None
+        # bcrypt занимает сотни миллисекунд, поэтому выполняется в фоновом потоке
+        self.runner = TaskRunner(self)
         self.init_ui()
 
     def init_ui(self):
@@ -78,6 +82,12 @@ class AuthDialog(QDialog):
 
         main_layout.addLayout(button_layout)
 
+        # Индикатор проверки пароля
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet(label_style)
+        self.status_label.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(self.status_label)
+
         # Центрируем кнопки
         button_layout.insertStretch(0, 1)
         button_layout.addStretch(1)
@@ -88,27 +98,84 @@ class AuthDialog(QDialog):
 
         self.setLayout(main_layout)
 
+    def set_busy(self, message=None):
+        """Блокирует ввод на время фоновой проверки пароля; message=None снимает блокировку."""
+        busy = message is not None
+        for widget in (self.login_input, self.password_input, self.login_btn, self.create_btn):
+            widget.setEnabled(not busy)
+        self.status_label.setText(message or "")
+        if busy:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+        else:
+            QApplication.restoreOverrideCursor()
+
+    def task_failed(self, message):
+        self.set_busy()
+        QMessageBox.warning(self, "Ошибка", f"Не удалось проверить пароль: {message}")
+
     def handle_login(self):
+        if self.runner.busy:
+            return
         login = self.login_input.text()
         password = self.password_input.text()
-        profile_id = self.db.authenticate(login, password)
-        if profile_id:
-            self.profile_id = profile_id
-            self.accept()
-        else:
+        stored = self.db.password_hash(login)
+        if stored is None:
+            QMessageBox.warning(self, "Ошибка", "Неверный логин или пароль")
+            return
+        profile_id, hashed = stored
+        rounds = self.db.password_rounds
+        self.set_busy("Проверка пароля…")
+        self.runner.submit(
+            lambda: check_password(password, hashed, rounds),
+            lambda result: self.login_checked(profile_id, *result),
+            self.task_failed
+        )
+
+    def login_checked(self, profile_id, valid, rehashed):
+        self.set_busy()
+        if not valid:
             QMessageBox.warning(self, "Ошибка", "Неверный логин или пароль")
+            return
+        # Хеш вычислен с прежней стоимостью: сохраняем пересчитанный
+        if rehashed is not None:
+            self.db.set_password_hash(profile_id, rehashed)
+        self.profile_id = profile_id
+        self.accept()
 
     def handle_create(self):
+        if self.runner.busy:
+            return
         login = self.login_input.text()
         password = self.password_input.text()
         if not login or not password:
             QMessageBox.warning(self, "Ошибка", "Заполните все поля")
             return
-        if self.db.create_profile(login, password):
+        if self.db.password_hash(login) is not None:
+            QMessageBox.warning(self, "Ошибка", "Логин уже существует")
+            return
+        rounds = self.db.password_rounds
+        self.set_busy("Создание профиля…")
+        self.runner.submit(
+            lambda: hash_password(password, rounds),
+            lambda hashed: self.profile_hashed(login, password, hashed),
+            self.task_failed
+        )
+
+    def profile_hashed(self, login, password, hashed):
+        self.set_busy()
+        if self.db.create_profile(login, password, hashed):
             QMessageBox.information(self, "Успех", "Профиль создан")
-            self.handle_login()
+            # Пароль только что захеширован, повторная проверка не нужна
+            self.profile_id = self.db.password_hash(login)[0]
+            self.accept()
         else:
             QMessageBox.warning(self, "Ошибка", "Логин уже существует")
 
+    def reject(self):
+        # Escape во время проверки пароля игнорируется: результат ещё не получен
+        if self.runner.busy:
+            return
+        super().reject()
+
     def handle_exit(self):
         QCoreApplication.instance().quit()
\ No newline at end of file
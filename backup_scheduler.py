@@ -0,0 +1,128 @@
+# backup_scheduler.py
+"""
+Автоматические резервные копии.
+
+BackupScheduler раз в CHECK_INTERVAL_MS проверяет, пора ли делать снимок:
+после every_writes записей в базу или если последнему снимку больше суток.
+Снимок создаётся в фоне (BackupWorker), после него там же старые снимки
+удаляются по политике хранения. При выходе из приложения несохранённые
+изменения записываются синхронным инкрементальным снимком (Database.backup_db);
+старые снимки удалит следующий фоновый снимок.
+"""
+from datetime import datetime, timedelta
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from backup_store import RetentionPolicy
+from workers import BackupWorker
+
+CHECK_INTERVAL_MS = 60 * 1000
+# Снимок после стольких записей в базу
+EVERY_WRITES = 100
+DAILY_INTERVAL = timedelta(days=1)
+
+# Пометки снимков в списке резервных копий
+NOTE_MANUAL = "вручную"
+NOTE_WRITES = "после изменений"
+NOTE_DAILY = "ежедневная"
+NOTE_EXIT = "при выходе"
+
+
+class BackupScheduler(QObject):
+    started = pyqtSignal(str)  # пометка снимка
+    progress = pyqtSignal(str, int, int)  # этап, сделано, всего
+    finished = pyqtSignal(object)  # манифест снимка
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, db, every_writes=EVERY_WRITES, daily=True, on_exit=True,
+                 retention=None, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.every_writes = every_writes  # None или 0 — не делать снимки по числу записей
+        self.daily = daily
+        self.on_exit = on_exit
+        self.retention = retention or RetentionPolicy()
+        self.writes_at_backup = db.writes
+        self._started_writes = db.writes  # число записей на момент запуска текущего снимка
+        # Время последнего снимка: читается из хранилища при первой проверке, дальше обновляется в памяти
+        self._last_backup = None
+        self.worker = BackupWorker(db, self.retention, self)
+        self.worker.progress.connect(self.progress)
+        self.worker.finished.connect(self._on_finished)
+        self.worker.failed.connect(self._on_failed)
+        self.worker.cancelled.connect(self.cancelled)
+        self.timer = QTimer(self)
+        self.timer.setInterval(CHECK_INTERVAL_MS)
+        self.timer.timeout.connect(self.check)
+
+    @property
+    def busy(self):
+        return self.worker.busy
+
+    def start_timer(self):
+        self.timer.start()
+
+    def last_backup_time(self):
+        if self._last_backup is None:
+            self._last_backup = self.db.backups.latest_created()
+        return self._last_backup
+
+    def due(self):
+        """Пометка снимка, который пора сделать, или None."""
+        if self.every_writes and self.db.writes - self.writes_at_backup >= self.every_writes:
+            return NOTE_WRITES
+        if self.daily:
+            last = self.last_backup_time()
+            if last is None or datetime.now() - last >= DAILY_INTERVAL:
+                return NOTE_DAILY
+        return None
+
+    def check(self):
+        note = self.due()
+        if note is not None:
+            self.start(note)
+
+    def start(self, note=NOTE_MANUAL):
+        """Запускает фоновый снимок; False, если снимок уже создаётся."""
+        writes = self.db.writes
+        if not self.worker.start(note):
+            return False
+        self._started_writes = writes
+        self.started.emit(note)
+        return True
+
+    def cancel(self):
+        self.worker.cancel()
+
+    def pause(self):
+        """
+        Останавливает проверки и дожидается отмены текущего снимка вместе с очисткой
+        после него: синхронный снимок (при выходе, перед восстановлением) не должен
+        пересекаться со сборкой мусора в хранилище.
+        """
+        self.timer.stop()
+        if self.worker.busy:
+            self.worker.cancel()
+            self.worker.wait()
+
+    def _on_finished(self, manifest):
+        # Отменённый или неудачный снимок не сбрасывает счётчик записей
+        self.writes_at_backup = self._started_writes
+        self._last_backup = datetime.fromisoformat(manifest["created"])
+        self.finished.emit(manifest)
+
+    def _on_failed(self, message):
+        print(f"Ошибка резервного копирования: {message}")
+        self.failed.emit(message)
+
+    def shutdown(self):
+        """
+        Вызывается при закрытии окна: останавливает фоновое копирование и,
+        если с последнего снимка были записи, создаёт снимок синхронно.
+        """
+        self.pause()
+        if self.on_exit and self.db.writes != self.writes_at_backup:
+            try:
+                self.db.backup_db(note=NOTE_EXIT)
+                self.writes_at_backup = self.db.writes
+            except Exception as e:
+                print(f"Ошибка резервного копирования при выходе: {e}")
@@ -0,0 +1,310 @@
+# backup_store.py
+"""
+Инкрементальное хранилище резервных копий.
+
+Файл базы делится на блоки по CHUNK_SIZE байт (целое число страниц SQLite).
+Каждый блок сохраняется один раз под именем, равным его SHA-256, в каталоге
+chunks/, а снимок — это манифест в manifests/ со списком хешей блоков.
+Блоки, не изменившиеся с прошлого снимка, повторно не записываются, поэтому
+новый снимок занимает на диске столько, сколько страниц изменилось.
+
+Блоки и манифесты записываются во временный файл и переименовываются, а
+манифест — последним: прерванный снимок оставляет только лишние блоки,
+которые удаляет collect_garbage.
+
+Работа с хранилищем без интерфейса:
+    python backup_store.py list
+    python backup_store.py import backups/finance_backup_*.db
+    python backup_store.py restore 20250101_120000 restored.db
+    python backup_store.py prune --keep-last 10 --keep-daily 7 --keep-weekly 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import zlib
+from datetime import datetime
+
+# Размер блока; дополнительно выравнивается по размеру страницы базы
+CHUNK_SIZE = 64 * 1024
+# Формат id снимка: время создания, при совпадении — с суффиксом _2, _3, ...
+ID_FORMAT = "%Y%m%d_%H%M%S"
+# Заголовок файла SQLite: размер страницы хранится в байтах 16-17
+SQLITE_HEADER = b"SQLite format 3\x00"
+
+
+class BackupCancelled(Exception):
+    pass
+
+
+class RetentionPolicy:
+    """
+    Какие снимки хранить: keep_last последних, а также самый новый снимок
+    каждого из keep_daily последних дней и keep_weekly последних недель,
+    в которые создавались снимки. Остальные снимки удаляются при очистке.
+    """
+
+    def __init__(self, keep_last=10, keep_daily=7, keep_weekly=4):
+        self.keep_last = keep_last
+        self.keep_daily = keep_daily
+        self.keep_weekly = keep_weekly
+
+    def expired(self, snapshots):
+        """id снимков, которые политика не сохраняет; snapshots — от старых к новым."""
+        newest_first = snapshots[::-1]
+        keep = {manifest["id"] for manifest in newest_first[:self.keep_last]}
+        for period, count in ((lambda d: d.date(), self.keep_daily),
+                              (lambda d: d.isocalendar()[:2], self.keep_weekly)):
+            seen = []
+            for manifest in newest_first:
+                key = period(datetime.fromisoformat(manifest["created"]))
+                if key in seen:
+                    continue
+                if len(seen) == count:
+                    break
+                seen.append(key)
+                keep.add(manifest["id"])
+        return [manifest["id"] for manifest in snapshots if manifest["id"] not in keep]
+
+
+def page_size(path):
+    """Размер страницы файла SQLite по его заголовку."""
+    with open(path, 'rb') as f:
+        header = f.read(100)
+    if len(header) < 100 or not header.startswith(SQLITE_HEADER):
+        raise ValueError(f"{path} не является базой SQLite")
+    size = int.from_bytes(header[16:18], "big")
+    return 65536 if size == 1 else size
+
+
+def _temp_file(path):
+    """
+    Открытый на запись временный файл рядом с path и его имя. Имя уникально,
+    поэтому одновременные запись блока и сборка снимка не мешают друг другу.
+    """
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".part",
+                                     dir=os.path.dirname(path) or ".")
+    return os.fdopen(fd, 'wb'), temp_path
+
+
+def _write_atomic(path, data):
+    f, temp_path = _temp_file(path)
+    try:
+        with f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class BackupStore:
+    def __init__(self, root="backups/snapshots", chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.chunks_dir = os.path.join(root, "chunks")
+        self.manifests_dir = os.path.join(root, "manifests")
+
+    def _chunk_path(self, digest):
+        # Первые два символа хеша — подкаталог, чтобы каталоги не разрастались
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _manifest_path(self, snapshot_id):
+        return os.path.join(self.manifests_dir, f"{snapshot_id}.json")
+
+    def _new_id(self, created):
+        base = created.strftime(ID_FORMAT)
+        snapshot_id, n = base, 1
+        while os.path.exists(self._manifest_path(snapshot_id)):
+            n += 1
+            snapshot_id = f"{base}_{n}"
+        return snapshot_id
+
+    # Создание снимков
+
+    def add_file(self, path, size=None, progress=None, created=None, note=""):
+        """
+        Сохраняет файл базы как новый снимок и возвращает его манифест.
+        size — число байт для чтения (по умолчанию весь файл); progress(done, total)
+        вызывается после каждого блока. В манифест добавляется поле stored —
+        сколько байт новых блоков записано на диск.
+        """
+        total = os.path.getsize(path) if size is None else size
+        page = page_size(path)
+        chunk_size = max(self.chunk_size - self.chunk_size % page, page)
+        created = created or datetime.now()
+        digests = []
+        stored = 0
+        done = 0
+        with open(path, 'rb') as f:
+            while done < total:
+                data = f.read(min(chunk_size, total - done))
+                if not data:
+                    raise ValueError(f"Файл {path} короче ожидаемых {total} байт")
+                digest = hashlib.sha256(data).hexdigest()
+                chunk_path = self._chunk_path(digest)
+                if not os.path.exists(chunk_path):
+                    os.makedirs(os.path.dirname(chunk_path), exist_ok=True)
+                    _write_atomic(chunk_path, zlib.compress(data, 1))
+                    stored += len(data)
+                digests.append(digest)
+                done += len(data)
+                if progress:
+                    progress(done, total)
+
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        manifest = {
+            "id": self._new_id(created),
+            "created": created.isoformat(timespec="seconds"),
+            "size": total,
+            "chunk_size": chunk_size,
+            "chunks": digests,
+            "note": note,
+        }
+        _write_atomic(self._manifest_path(manifest["id"]),
+                      json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+        manifest["stored"] = stored
+        return manifest
+
+    # Чтение снимков
+
+    def snapshots(self):
+        """Манифесты всех снимков, от старых к новым."""
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        result = []
+        for name in sorted(os.listdir(self.manifests_dir)):
+            if name.endswith(".json"):
+                result.append(self.manifest(name[:-len(".json")]))
+        result.sort(key=lambda manifest: (manifest["created"], manifest["id"]))
+        return result
+
+    def latest_created(self):
+        """Время создания самого нового снимка по именам манифестов, без их чтения; None, если снимков нет."""
+        if not os.path.isdir(self.manifests_dir):
+            return None
+        stamps = [name[:15] for name in os.listdir(self.manifests_dir) if name.endswith(".json")]
+        return datetime.strptime(max(stamps), ID_FORMAT) if stamps else None
+
+    def manifest(self, snapshot_id):
+        try:
+            with open(self._manifest_path(snapshot_id), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Снимок {snapshot_id} не найден")
+
+    def restore(self, snapshot_id, path, progress=None):
+        """
+        Собирает файл базы снимка в path. Каждый блок проверяется по хешу;
+        файл пишется во временный путь и заменяет path только целиком.
+        """
+        manifest = self.manifest(snapshot_id)
+        total = manifest["size"]
+        done = 0
+        f, temp_path = _temp_file(path)
+        try:
+            with f:
+                for digest in manifest["chunks"]:
+                    try:
+                        with open(self._chunk_path(digest), 'rb') as chunk:
+                            data = zlib.decompress(chunk.read())
+                    except FileNotFoundError:
+                        raise ValueError(f"Снимок {snapshot_id} повреждён: нет блока {digest}")
+                    if hashlib.sha256(data).hexdigest() != digest:
+                        raise ValueError(f"Снимок {snapshot_id} повреждён: блок {digest} изменён")
+                    f.write(data)
+                    done += len(data)
+                    if progress:
+                        progress(done, total)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return path
+
+    # Удаление снимков
+
+    def remove(self, snapshot_id):
+        """Удаляет манифест снимка; освободившиеся блоки удаляет collect_garbage."""
+        os.remove(self._manifest_path(snapshot_id))
+
+    def prune(self, policy):
+        """
+        Удаляет снимки, не сохраняемые политикой, и их блоки.
+        Возвращает (id удалённых снимков, освобождённые байты).
+        """
+        removed = policy.expired(self.snapshots())
+        for snapshot_id in removed:
+            self.remove(snapshot_id)
+        freed = self.collect_garbage() if removed else 0
+        return removed, freed
+
+    def collect_garbage(self):
+        """
+        Удаляет блоки, на которые не ссылается ни один снимок; возвращает освобождённые байты.
+        Нельзя вызывать во время создания снимка: его блоки ещё не попали в манифест.
+        """
+        if not os.path.isdir(self.chunks_dir):
+            return 0
+        used = set()
+        for manifest in self.snapshots():
+            used.update(manifest["chunks"])
+        freed = 0
+        for subdir in os.listdir(self.chunks_dir):
+            directory = os.path.join(self.chunks_dir, subdir)
+            for name in os.listdir(directory):
+                if name not in used:
+                    path = os.path.join(directory, name)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+        return freed
+
+    def disk_usage(self):
+        """Байт, занимаемых блоками на диске (после сжатия)."""
+        total = 0
+        for directory, _, names in os.walk(self.chunks_dir):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+        return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Инкрементальные резервные копии базы")
+    parser.add_argument("--root", default="backups/snapshots", help="каталог хранилища")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="список снимков")
+    import_parser = commands.add_parser("import", help="добавить полные копии базы как снимки")
+    import_parser.add_argument("paths", nargs="+")
+    restore_parser = commands.add_parser("restore", help="собрать файл базы снимка")
+    restore_parser.add_argument("snapshot_id")
+    restore_parser.add_argument("path")
+    prune_parser = commands.add_parser("prune", help="удалить старые снимки по политике хранения")
+    prune_parser.add_argument("--keep-last", type=int, default=10)
+    prune_parser.add_argument("--keep-daily", type=int, default=7)
+    prune_parser.add_argument("--keep-weekly", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    store = BackupStore(args.root)
+    if args.command == "list":
+        for manifest in store.snapshots():
+            print(f"{manifest['id']}  {manifest['created']}  {manifest['size'] / 1048576:.1f} МБ  {manifest['note']}")
+        print(f"Блоки на диске: {store.disk_usage() / 1048576:.1f} МБ")
+    elif args.command == "import":
+        for path in args.paths:
+            created = datetime.fromtimestamp(os.path.getmtime(path))
+            manifest = store.add_file(path, created=created, note=os.path.basename(path))
+            print(f"{path} -> {manifest['id']}, новых данных {manifest['stored'] / 1048576:.1f} МБ")
+    elif args.command == "restore":
+        store.restore(args.snapshot_id, args.path)
+        print(f"Снимок {args.snapshot_id} восстановлен в {args.path}")
+    elif args.command == "prune":
+        removed, freed = store.prune(RetentionPolicy(args.keep_last, args.keep_daily, args.keep_weekly))
+        print(f"Удалено снимков: {len(removed)}, освобождено {freed / 1048576:.1f} МБ")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,7 +4,10 @@ from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTa
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtGui import QFont, QColor
 import sqlite3
-from datetime import datetime, timedelta
+from repository import LimitRepository
+from services import BudgetService
+from workers import QueryExecutor
+from units import to_kopecks, format_amount
 
 
 class BudgetTab(QWidget):
@@ -14,10 +17,15 @@ class BudgetTab(QWidget):
         super().__init__()
         self.db = db
         self.profile_id = profile_id
+        self.limits = LimitRepository(db)
+        self.categories = db.category_cache(profile_id)
+        self.categories.add_listener(self.update_categories)
+        self.executor = QueryExecutor(db, self)
         self.load_timer = QTimer()
         self.load_timer.setSingleShot(True)
         self.load_timer.timeout.connect(self.load_limits)
         self.notified_limits = set()  # Множество для отслеживания лимитов с уведомлениями
+        self.limit_rows = []
         self.init_ui()
 
     def init_ui(self):
@@ -90,91 +98,83 @@ class BudgetTab(QWidget):
     def update_categories(self):
         self.category_combo.clear()
         self.category_combo.addItem("Все")
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM categories WHERE profile_id = ? AND type = 'Расход'",
-                           (self.profile_id,))
-            for cat_id, name in cursor.fetchall():
-                self.category_combo.addItem(name, cat_id)
-
-    def get_period_range(self, period):
-        """Возвращает начальную и конечную даты для периода"""
-        today = datetime.now()
-        if period == "Неделя":
-            start = today - timedelta(days=today.weekday())
-            end = start + timedelta(days=6)
-        elif period == "Месяц":
-            start = today.replace(day=1)
-            end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        elif period == "Год":
-            start = today.replace(month=1, day=1)
-            end = today.replace(month=12, day=31)
-        return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+        for cat_id, name, _ in self.categories.list("Расход"):
+            self.category_combo.addItem(name, cat_id)
 
     def load_limits(self):
+        category_id = None
+        if self.category_combo.currentText() != "Все":
+            category_id = self.category_combo.itemData(self.category_combo.currentIndex()) or None
+        profile_id = self.profile_id
+
+        # Остатки всех лимитов считаются одним запросом в фоне, таблица заполняется по готовности
+        self.executor.submit(
+            lambda db: BudgetService(db).evaluate(profile_id, category_id=category_id),
+            self.show_limits, self.show_load_error
+        )
+
+    def show_load_error(self, message):
+        QMessageBox.critical(self, "Ошибка", f"Ошибка базы данных: {message}")
+
+    def show_limits(self, limits):
+        # Список LimitStatus от BudgetService
+        self.limit_rows = limits
         self.table.setRowCount(0)
-        query = """
-            SELECT l.id, c.name, l.amount, l.period 
-            FROM limits l 
-            JOIN categories c ON l.category_id = c.id 
-            WHERE l.profile_id = ?
-        """
-        params = [self.profile_id]
-        category_text = self.category_combo.currentText()
-        if category_text != "Все":
-            category_id = self.category_combo.itemData(self.category_combo.currentIndex())
-            if category_id:
-                query += " AND l.category_id = ?"
-                params.append(category_id)
-
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            for row, (id_, category, limit_amount, period) in enumerate(cursor.fetchall()):
-                start_date, end_date = self.get_period_range(period)
-                cursor.execute("""
-                    SELECT SUM(amount) 
-                    FROM transactions 
-                    WHERE profile_id = ? AND category_id = ? AND type = 'Расход' 
-                    AND date BETWEEN ? AND ?
-                """, (self.profile_id, self.category_combo.itemData(self.category_combo.findText(category)), start_date,
-                      end_date))
-                spent = cursor.fetchone()[0] or 0
-                remaining = limit_amount - spent
-
-                self.table.insertRow(row)
-                self.table.setItem(row, 0, QTableWidgetItem(category))
-                self.table.setItem(row, 1, QTableWidgetItem(f"{limit_amount:.2f} ₽"))
-                remaining_item = QTableWidgetItem(f"{remaining:.2f} ₽")
-                self.table.setItem(row, 2, remaining_item)
-                self.table.setItem(row, 3, QTableWidgetItem(period))
-
-                # Окрашивание ячейки "Остаток"
-                used_percentage = (spent / limit_amount * 100) if limit_amount > 0 else 0
-                if used_percentage >= 100:
-                    remaining_item.setBackground(QColor("#FF5555"))  # Красный
-                    # Проверяем, не было ли уже уведомления для этого лимита
-                    if id_ not in self.notified_limits and remaining <= 0:
-                        QMessageBox.warning(
-                            self,
-                            "Превышение лимита",
-                            f"Лимит для категории '{category}' ({period}) превышен! Остаток: {remaining:.2f} ₽"
-                        )
-                        self.notified_limits.add(id_)  # Добавляем ID лимита в множество
-                elif used_percentage >= 70:
-                    remaining_item.setBackground(QColor("#FFFF55"))  # Жёлтый
-
-                self.table.setRowHeight(row, 40)
-                for col in range(4):
-                    self.table.item(row, col).setTextAlignment(Qt.AlignCenter)
-                item = self.table.item(row, 0)
-                if item:
-                    item.setData(Qt.UserRole, id_)
+        for row in range(len(limits)):
+            self.table.insertRow(row)
+            self.show_limit_row(row)
 
         header = self.table.horizontalHeader()
         for i in range(4):
             header.setSectionResizeMode(i, header.Stretch)
 
+    def show_limit_row(self, row):
+        status = self.limit_rows[row]
+        id_, category, period, remaining = status.limit_id, status.category, status.period, status.remaining
+
+        self.table.setItem(row, 0, QTableWidgetItem(category))
+        self.table.setItem(row, 1, QTableWidgetItem(f"{format_amount(status.amount)} ₽"))
+        remaining_item = QTableWidgetItem(f"{format_amount(remaining)} ₽")
+        self.table.setItem(row, 2, remaining_item)
+        self.table.setItem(row, 3, QTableWidgetItem(period))
+
+        # Окрашивание ячейки "Остаток"
+        used_percentage = status.used_percentage
+        if used_percentage >= 100:
+            remaining_item.setBackground(QColor("#FF5555"))  # Красный
+            # Проверяем, не было ли уже уведомления для этого лимита
+            if id_ not in self.notified_limits and remaining <= 0:
+                QMessageBox.warning(
+                    self,
+                    "Превышение лимита",
+                    f"Лимит для категории '{category}' ({period}) превышен! Остаток: {format_amount(remaining)} ₽"
+                )
+                self.notified_limits.add(id_)  # Добавляем ID лимита в множество
+        elif used_percentage >= 70:
+            remaining_item.setBackground(QColor("#FFFF55"))  # Жёлтый
+
+        self.table.setRowHeight(row, 40)
+        for col in range(4):
+            self.table.item(row, col).setTextAlignment(Qt.AlignCenter)
+        item = self.table.item(row, 0)
+        if item:
+            item.setData(Qt.UserRole, id_)
+
+    def apply_change(self, change):
+        """Пересчитывает только лимиты категории и периода, которых касается TransactionChange"""
+        if self.executor.pending:
+            # Загружаемый результат мог быть прочитан до изменения
+            self.load_limits()
+            return
+        for row, status in enumerate(self.limit_rows):
+            changed = False
+            for sign, (_, day, category_id, _, type_, amount, _) in change.deltas():
+                if type_ == "Расход" and status.covers(category_id, day):
+                    status.spent += sign * amount
+                    changed = True
+            if changed:
+                self.show_limit_row(row)
+
     def update_limits(self):
         self.load_timer.start(300)
 
@@ -206,10 +206,7 @@ class BudgetTab(QWidget):
 
     def delete_limit(self, limit_id):
         if QMessageBox.question(self, "Подтверждение", "Удалить лимит?") == QMessageBox.Yes:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM limits WHERE id = ? AND profile_id = ?", (limit_id, self.profile_id))
-                conn.commit()
+            self.limits.delete(self.profile_id, limit_id)
             self.notified_limits.discard(limit_id)  # Удаляем ID лимита из множества уведомлений
             self.load_limits()
             self.limit_updated.emit()
@@ -221,6 +218,8 @@ class LimitDialog(QDialog):
         self.db = db
         self.profile_id = profile_id
         self.limit_id = limit_id
+        self.limits = LimitRepository(db)
+        self.categories = db.category_cache(profile_id)
         self.init_ui()
 
     def init_ui(self):
@@ -276,59 +275,39 @@ class LimitDialog(QDialog):
         cancel_btn.clicked.connect(self.reject)
 
         if self.limit_id:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT category_id, amount, period FROM limits WHERE id = ? AND profile_id = ?",
-                    (self.limit_id, self.profile_id)
-                )
-                cat_id, amount, period = cursor.fetchone()
-                self.category_combo.setCurrentIndex(self.category_combo.findData(cat_id))
-                self.amount_input.setText(str(amount))
-                self.period_combo.setCurrentText(period or "Месяц")
+            cat_id, amount, period = self.limits.get(self.profile_id, self.limit_id)
+            self.category_combo.setCurrentIndex(self.category_combo.findData(cat_id))
+            self.amount_input.setText(format_amount(amount))
+            self.period_combo.setCurrentText(period or "Месяц")
 
         self.setLayout(layout)
 
     def update_categories(self):
         self.category_combo.clear()
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, name FROM categories WHERE profile_id = ? AND type = 'Расход'",
-                           (self.profile_id,))
-            for cat_id, name in cursor.fetchall():
-                self.category_combo.addItem(name, cat_id)
+        for cat_id, name, _ in self.categories.list("Расход"):
+            self.category_combo.addItem(name, cat_id)
 
     def save(self):
         try:
-            amount = float(self.amount_input.text())
+            try:
+                amount = to_kopecks(self.amount_input.text().strip())
+            except ArithmeticError:
+                raise ValueError("Введите корректное число в поле 'Лимит'")
             if amount <= 0:
                 raise ValueError("Сумма лимита должна быть положительной")
-            if amount > 1_000_000:
+            if amount > to_kopecks(1_000_000):
                 raise ValueError("Сумма лимита не должна превышать 1,000,000 ₽")
             category_id = self.category_combo.itemData(self.category_combo.currentIndex())
             period = self.period_combo.currentText()
 
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT id FROM limits WHERE profile_id = ? AND category_id = ? AND period = ? AND id != ?",
-                    (self.profile_id, category_id, period, self.limit_id or 0)
-                )
-                if cursor.fetchone():
-                    raise ValueError("Лимит для этой категории и периода уже существует")
-
-                if self.limit_id:
-                    cursor.execute(
-                        "UPDATE limits SET category_id = ?, amount = ?, period = ? WHERE id = ? AND profile_id = ?",
-                        (category_id, amount, period, self.limit_id, self.profile_id)
-                    )
-                else:
-                    cursor.execute(
-                        "INSERT INTO limits (profile_id, category_id, amount, period) VALUES (?, ?, ?, ?)",
-                        (self.profile_id, category_id, amount, period)
-                    )
-                conn.commit()
-                self.accept()
+            if self.limits.exists(self.profile_id, category_id, period, self.limit_id):
+                raise ValueError("Лимит для этой категории и периода уже существует")
+
+            if self.limit_id:
+                self.limits.update(self.profile_id, self.limit_id, category_id, amount, period)
+            else:
+                self.limits.insert(self.profile_id, category_id, amount, period)
+            self.accept()
         except ValueError as e:
             QMessageBox.warning(self, "Ошибка", str(e))
         except sqlite3.Error as e:
@@ -1,18 +1,18 @@
 # categories.py
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QComboBox, \
     QDialog, QFormLayout, QMessageBox, QMenu, QLabel, QLineEdit
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
 import sqlite3
 
 
 class CategoriesTab(QWidget):
-    category_updated = pyqtSignal()  # Сигнал для уведомления об изменениях категорий
-
     def __init__(self, db, profile_id):
         super().__init__()
         self.db = db
         self.profile_id = profile_id
+        self.categories = db.category_cache(profile_id)
+        self.categories.add_listener(self.load_categories)
         self.init_ui()
 
     def init_ui(self):
@@ -90,27 +90,19 @@ class CategoriesTab(QWidget):
     def load_categories(self):
         self.table.setRowCount(0)
         type_ = self.type_combo.currentText()
-        query = "SELECT id, name, type FROM categories WHERE profile_id = ?"
-        params = [self.profile_id]
-        if type_ != "Все":
-            query += " AND type = ?"
-            params.append(type_)
-
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            for row, (id_, name, type_) in enumerate(cursor.fetchall()):
-                self.table.insertRow(row)
-                name_item = QTableWidgetItem(name)
-                type_item = QTableWidgetItem(type_)
-                # Сохраняем category_id в данных ячейки
-                name_item.setData(Qt.UserRole, id_)
-                self.table.setItem(row, 0, name_item)
-                self.table.setItem(row, 1, type_item)
-                self.table.setRowHeight(row, 40)  # Увеличенная высота строк
-                # Выравнивание по центру
-                for col in range(2):
-                    self.table.item(row, col).setTextAlignment(Qt.AlignCenter)
+        categories = self.categories.list(None if type_ == "Все" else type_)
+        for row, (id_, name, type_) in enumerate(categories):
+            self.table.insertRow(row)
+            name_item = QTableWidgetItem(name)
+            type_item = QTableWidgetItem(type_)
+            # Сохраняем category_id в данных ячейки
+            name_item.setData(Qt.UserRole, id_)
+            self.table.setItem(row, 0, name_item)
+            self.table.setItem(row, 1, type_item)
+            self.table.setRowHeight(row, 40)  # Увеличенная высота строк
+            # Выравнивание по центру
+            for col in range(2):
+                self.table.item(row, col).setTextAlignment(Qt.AlignCenter)
 
         header = self.table.horizontalHeader()
         for i in range(self.table.columnCount()):
@@ -132,31 +124,18 @@ class CategoriesTab(QWidget):
             self.delete_category(category_id)
 
     def add_category(self):
-        dialog = CategoryDialog(self.db, self.profile_id)
-        if dialog.exec_():
-            self.load_categories()
-            self.category_updated.emit()
+        # Таблица и списки категорий в других вкладках обновятся через подписку на кэш категорий
+        CategoryDialog(self.db, self.profile_id).exec_()
 
     def rename_category(self, row, category_id):
-        dialog = CategoryDialog(self.db, self.profile_id, category_id)
-        if dialog.exec_():
-            self.load_categories()  # Обновляем таблицу с сохранением выравнивания
-            self.category_updated.emit()
+        CategoryDialog(self.db, self.profile_id, category_id).exec_()
 
     def delete_category(self, category_id):
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM transactions WHERE category_id = ? AND profile_id = ?",
-                           (category_id, self.profile_id))
-            count = cursor.fetchone()[0]
-            if count > 0:
-                QMessageBox.warning(self, "Ошибка", "Нельзя удалить категорию, которая используется в операциях")
-                return
-            if QMessageBox.question(self, "Подтверждение", "Удалить категорию?") == QMessageBox.Yes:
-                cursor.execute("DELETE FROM categories WHERE id = ? AND profile_id = ?", (category_id, self.profile_id))
-                conn.commit()
-                self.load_categories()
-                self.category_updated.emit()
+        if self.categories.is_used(category_id):
+            QMessageBox.warning(self, "Ошибка", "Нельзя удалить категорию, которая используется в операциях")
+            return
+        if QMessageBox.question(self, "Подтверждение", "Удалить категорию?") == QMessageBox.Yes:
+            self.categories.delete(category_id)
 
 
 class CategoryDialog(QDialog):
@@ -165,6 +144,7 @@ class CategoryDialog(QDialog):
         self.db = db
         self.profile_id = profile_id
         self.category_id = category_id
+        self.categories = db.category_cache(profile_id)
         self.init_ui()
 
     def init_ui(self):
@@ -220,13 +200,9 @@ class CategoryDialog(QDialog):
 
         # Загрузка данных для редактирования
         if self.category_id:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT name, type FROM categories WHERE id = ? AND profile_id = ?",
-                               (self.category_id, self.profile_id))
-                name, type_ = cursor.fetchone()
-                self.name_input.setText(name)
-                self.type_combo.setCurrentText(type_)
+            name, type_ = self.categories.get(self.category_id)
+            self.name_input.setText(name)
+            self.type_combo.setCurrentText(type_)
 
         self.setLayout(layout)
 
@@ -236,17 +212,12 @@ class CategoryDialog(QDialog):
             QMessageBox.warning(self, "Ошибка", "Введите название категории")
             return
         type_ = self.type_combo.currentText()
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
+        try:
             if self.category_id:
-                cursor.execute(
-                    "UPDATE categories SET name = ?, type = ? WHERE id = ? AND profile_id = ?",
-                    (name, type_, self.category_id, self.profile_id)
-                )
+                self.categories.update(self.category_id, name, type_)
             else:
-                cursor.execute(
-                    "INSERT INTO categories (profile_id, name, type) VALUES (?, ?, ?)",
-                    (self.profile_id, name, type_)
-                )
-            conn.commit()
-            self.accept()
\ No newline at end of file
+                self.categories.insert(name, type_)
+        except sqlite3.IntegrityError:
+            QMessageBox.warning(self, "Ошибка", "Категория с таким названием уже существует")
+            return
+        self.accept()
\ No newline at end of file
@@ -0,0 +1,153 @@
+# charts.py
+"""
+Диаграммы вкладки статистики.
+
+ChartController создаёт круговую диаграмму и гистограмму один раз и при
+обновлении данных меняет значения существующих срезов и столбцов
+(QPieSlice.setValue, QBarSet.replace), а не строит новые QChart, серии и оси.
+Анимация серий отключается, если точек больше ANIMATION_LIMIT: на больших
+наборах она только задерживает перерисовку.
+"""
+from PyQt5.QtCore import Qt
+from PyQt5.QtChart import QChart, QPieSeries, QBarCategoryAxis, QValueAxis, QBarSeries, QBarSet
+from PyQt5 import QtGui
+from PyQt5.QtGui import QFont
+
+PIE_TITLE = "Распределение по категориям"
+BAR_TITLE = "Доходы и расходы по датам"
+
+# Число срезов или столбцов, выше которого анимация отключается
+ANIMATION_LIMIT = 40
+
+PIE_COLORS = [
+    '#FF6384',  # Розовый
+    '#36A2EB',  # Синий
+    '#FFCE56',  # Желтый
+    '#4BC0C0',  # Бирюзовый
+    '#9966FF',  # Фиолетовый
+    '#FF9F40',  # Оранжевый
+    '#7BE041',  # Зеленый
+    '#FF6F61',  # Коралловый
+    '#6B5B95',  # Темно-фиолетовый
+    '#88B04B',  # Оливковый
+    '#F7CAC9',  # Светло-розовый
+]
+
+
+def set_bar_values(bar_set, values):
+    """Заменяет значения набора столбцов, меняя только отличающиеся и лишние/недостающие."""
+    count = bar_set.count()
+    for index, value in enumerate(values[:count]):
+        if bar_set.at(index) != value:
+            bar_set.replace(index, value)
+    if len(values) > count:
+        bar_set.append(values[count:])
+    elif len(values) < count:
+        bar_set.remove(len(values), count - len(values))
+
+
+class ChartController:
+    def __init__(self, chart_view):
+        self.view = chart_view
+        self.pie_chart = None
+        self.bar_chart = None
+        self.colors = [QtGui.QColor(c) for c in PIE_COLORS]
+        self.label_font = QFont("Arial", 12)
+
+    @property
+    def current(self):
+        """Какая диаграмма показана: "pie", "bar" или None."""
+        chart = self.view.chart()
+        if chart is not None and chart is self.pie_chart:
+            return "pie"
+        if chart is not None and chart is self.bar_chart:
+            return "bar"
+        return None
+
+    def _show(self, chart, points):
+        chart.setAnimationOptions(QChart.SeriesAnimations if points <= ANIMATION_LIMIT else QChart.NoAnimation)
+        if self.view.chart() is not chart:
+            self.view.setChart(chart)
+
+    def _create_pie_chart(self):
+        self.pie_series = QPieSeries()
+        self.pie_chart = QChart()
+        self.pie_chart.addSeries(self.pie_series)
+        self.pie_chart.setTitle(PIE_TITLE)
+        self.pie_chart.setTitleFont(QFont("Arial", 16))
+        self.pie_chart.legend().setVisible(True)
+        self.pie_chart.legend().setFont(QFont("Arial", 12))
+
+    def show_pie(self, names, amounts):
+        """Показывает доли категорий; срезы переиспользуются по порядку."""
+        if self.pie_chart is None:
+            self._create_pie_chart()
+        series = self.pie_series
+        slices = series.slices()
+        # Лишние срезы удаляются с конца, недостающие добавляются
+        for slice_ in slices[len(names):]:
+            series.remove(slice_)
+        for name in names[len(slices):]:
+            series.append(name, 0)
+        total = sum(amounts)
+        for i, (slice_, name, amount) in enumerate(zip(series.slices(), names, amounts)):
+            slice_.setValue(amount)
+            percentage = amount / total * 100 if total else 0
+            if percentage >= 2:
+                slice_.setLabel(f"{name} {percentage:.1f}%")
+                slice_.setLabelVisible(True)
+                slice_.setLabelFont(self.label_font)
+            else:
+                slice_.setLabel(name)
+                slice_.setLabelVisible(False)
+            slice_.setColor(self.colors[i % len(self.colors)])
+        self._show(self.pie_chart, len(names))
+
+    def _create_bar_chart(self):
+        self.income_set = QBarSet("Доходы")
+        self.expense_set = QBarSet("Расходы")
+        self.income_set.setColor(QtGui.QColor("green"))
+        self.expense_set.setColor(QtGui.QColor("red"))
+
+        # Серия без накопления
+        self.bar_series = QBarSeries()
+        self.bar_series.append(self.income_set)
+        self.bar_series.append(self.expense_set)
+        self.bar_series.setBarWidth(0.35)
+
+        self.bar_chart = QChart()
+        self.bar_chart.addSeries(self.bar_series)
+        self.bar_chart.setTitle(BAR_TITLE)
+        self.bar_chart.setTitleFont(QFont("Arial", 16))
+
+        # Ось X (категории)
+        self.axis_x = QBarCategoryAxis()
+        self.axis_x.setLabelsFont(QFont("Arial", 10))
+        self.bar_chart.addAxis(self.axis_x, Qt.AlignBottom)
+        self.bar_series.attachAxis(self.axis_x)
+
+        # Ось Y (суммы)
+        self.axis_y = QValueAxis()
+        self.axis_y.setLabelsFont(QFont("Arial Unicode MS", 10))
+        self.axis_y.setLabelFormat("%.2f ")
+        self.axis_y.setTitleText("Сумма (₽)")
+        self.axis_y.setTitleFont(QFont("Arial Unicode MS", 12))
+        self.bar_chart.addAxis(self.axis_y, Qt.AlignLeft)
+        self.bar_series.attachAxis(self.axis_y)
+
+        self.bar_chart.legend().setVisible(True)
+        self.bar_chart.legend().setFont(QFont("Arial", 10))
+        self.bar_chart.legend().setAlignment(Qt.AlignBottom)
+
+    def show_bars(self, categories, incomes, expenses, title=""):
+        """Показывает доходы и расходы по интервалам; пустые списки дают пустую гистограмму."""
+        if self.bar_chart is None:
+            self._create_bar_chart()
+        set_bar_values(self.income_set, incomes)
+        set_bar_values(self.expense_set, expenses)
+        if self.axis_x.categories() != categories:
+            self.axis_x.setCategories(categories)
+        self.axis_x.setTitleText(title)
+        max_value = max(max(incomes, default=0), max(expenses, default=0)) * 1.2
+        self.axis_y.setRange(0, max_value if max_value > 0 else 1000)
+        self._show(self.bar_chart, len(categories))
@@ -1,78 +1,175 @@
 # database.py
 import sqlite3
 import os
-import bcrypt
-from datetime import datetime
+import time
+import weakref
+from contextlib import closing, contextmanager
 import shutil
+from migrations import migrate, ensure_fulltext, SCHEMA_VERSION
+from repository import CategoryCache
+from passwords import DEFAULT_ROUNDS, hash_password, verify_password, check_password
 
 
 class Database:
-    def __init__(self, db_path="db/finance.db"):
+    # Настройки соединения: WAL позволяет читать во время записи,
+    # NORMAL достаточно надёжен в режиме WAL и заметно быстрее FULL
+    PRAGMAS = (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("temp_store", "MEMORY"),
+        ("cache_size", -16000),  # ~16 МБ кэша страниц
+        ("mmap_size", 268435456),
+    )
+    # Фоновая копия базы: страниц за один шаг backup API и пауза между шагами,
+    # чтобы копирование не отнимало у интерфейса доступ к диску
+    BACKUP_STEP_PAGES = 256
+    BACKUP_STEP_PAUSE = 0.02
+
+    def __init__(self, db_path="db/finance.db", cached_statements=256, password_rounds=DEFAULT_ROUNDS,
+                 backup_dir="backups"):
         self.db_path = db_path
+        self.backup_dir = backup_dir
+        self._backups = None
+        self.cached_statements = cached_statements
+        # Стоимость bcrypt для новых хешей; старые пересчитываются при входе
+        self.password_rounds = password_rounds
+        self._conn = None
+        self._depth = 0
+        # Соединения фоновых читателей: (слабая ссылка на владельца, соединение)
+        self._readers = []
+        self._category_caches = {}
+        # Версии данных профилей для проверки кэшей; эпоха меняется при замене всей базы
+        self._data_versions = {}
+        self._data_epoch = 0
+        # Число записей с момента открытия: по нему планировщик решает, пора ли делать снимок
+        self.writes = 0
+        self.fulltext = False
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
         self.init_db()
 
-    def init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            # Таблица профилей
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS profiles (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    login TEXT UNIQUE NOT NULL,
-                    password TEXT NOT NULL
-                )
-            """)
-            # Таблица категорий
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS categories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    profile_id INTEGER,
-                    name TEXT NOT NULL,
-                    type TEXT NOT NULL CHECK(type IN ('Доход', 'Расход')),
-                    UNIQUE(profile_id, name),
-                    FOREIGN KEY(profile_id) REFERENCES profiles(id)
-                )
-            """)
-            # Таблица операций
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS transactions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    profile_id INTEGER,
-                    date TEXT NOT NULL,
-                    category_id INTEGER,
-                    type TEXT NOT NULL CHECK(type IN ('Доход', 'Расход')),
-                    amount REAL NOT NULL,
-                    description TEXT,
-                    FOREIGN KEY(profile_id) REFERENCES profiles(id),
-                    FOREIGN KEY(category_id) REFERENCES categories(id)
-                )
-            """)
-            # Таблица лимитов
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS limits (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    profile_id INTEGER,
-                    category_id INTEGER,
-                    amount REAL NOT NULL,
-                    period TEXT DEFAULT 'Месяц' CHECK(period IN ('Неделя', 'Месяц', 'Год')),
-                    FOREIGN KEY(profile_id) REFERENCES profiles(id),
-                    FOREIGN KEY(category_id) REFERENCES categories(id)
-                )
-            """)
-            # Проверяем, есть ли столбец period в таблице limits (миграция для существующих баз)
-            cursor.execute("PRAGMA table_info(limits)")
-            columns = [info[1] for info in cursor.fetchall()]
-            if 'period' not in columns:
-                cursor.execute("""
-                    ALTER TABLE limits ADD COLUMN period TEXT DEFAULT 'Месяц' CHECK(period IN ('Неделя', 'Месяц', 'Год'))
-                """)
-            conn.commit()
-
-    def create_profile(self, login, password):
-        hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, cached_statements=self.cached_statements)
+        for name, value in self.PRAGMAS:
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def open_reader(self, owner):
+        """
+        Открывает отдельное соединение только для чтения для фоновых запросов.
+        Соединение можно использовать из другого потока; благодаря WAL оно
+        читает параллельно с записью в основном соединении.
+        owner.close_reader() вызывается при закрытии базы: владелец должен
+        дождаться своих запросов и закрыть соединение.
+        """
+        conn = sqlite3.connect(self.db_path, cached_statements=self.cached_statements, check_same_thread=False)
+        for name, value in self.PRAGMAS:
+            if name != "journal_mode":
+                conn.execute(f"PRAGMA {name} = {value}")
+        conn.execute("PRAGMA query_only = ON")
+        # Слабая ссылка: удалённые вкладки не удерживаются базой, а их соединение
+        # закрывается, когда владелец собран сборщиком мусора
+        self._readers.append((weakref.ref(owner, self._owner_collected), conn))
+        return conn
+
+    def _owner_collected(self, owner_ref):
+        for ref, conn in [reader for reader in self._readers if reader[0] is owner_ref]:
+            self._readers.remove((ref, conn))
+            conn.close()
+
+    def close_readers(self):
+        """
+        Закрывает соединения всех фоновых читателей через owner.close_reader().
+        Если C++-объект владельца уже удалён вместе с вкладкой, его пул потоков
+        дождался запросов при удалении, и соединение закрывается напрямую.
+        """
+        readers, self._readers = self._readers, []
+        for owner_ref, conn in readers:
+            owner = owner_ref()
+            if owner is not None:
+                try:
+                    owner.close_reader()
+                except RuntimeError as e:
+                    print(f"Владелец фонового соединения уже удалён: {e}")
+            conn.close()
+
+    def data_version(self, profile_id):
+        """Версия данных профиля: меняется при каждой записи операций или категорий."""
+        return self._data_epoch, self._data_versions.get(profile_id, 0)
+
+    def bump_data_version(self, profile_id=None):
+        """Отмечает изменение данных профиля; None — всех профилей (например, после восстановления)."""
+        self.note_write()
+        if profile_id is None:
+            self._data_epoch += 1
+        else:
+            self._data_versions[profile_id] = self._data_versions.get(profile_id, 0) + 1
+
+    def note_write(self):
+        """
+        Учитывает запись в базу для планировщика снимков. Записи, не влияющие
+        на кэши операций и категорий (например, лимиты), версию данных не меняют.
+        """
+        self.writes += 1
+
+    @property
+    def backups(self):
+        """Хранилище инкрементальных снимков базы: неизменившиеся блоки хранятся один раз."""
+        if self._backups is None:
+            # Модуль не нужен окну входа и загружается при первом обращении к копиям
+            from backup_store import BackupStore
+            self._backups = BackupStore(os.path.join(self.backup_dir, "snapshots"))
+        return self._backups
+
+    def category_cache(self, profile_id):
+        """Общий для всех вкладок кэш категорий профиля."""
+        cache = self._category_caches.get(profile_id)
+        if cache is None:
+            cache = self._category_caches[profile_id] = CategoryCache(self, profile_id)
+        return cache
+
+    @contextmanager
+    def connection(self):
+        """
+        Выдаёт долгоживущее соединение с базой.
+        Транзакция фиксируется при выходе из самого внешнего блока и
+        откатывается при исключении; вложенные блоки используют ту же транзакцию.
+        """
+        if self._conn is None:
+            self._conn = self._open()
+        conn = self._conn
+        self._depth += 1
+        try:
+            yield conn
+        except BaseException:
+            if self._depth == 1:
+                conn.rollback()
+            raise
+        else:
+            if self._depth == 1:
+                conn.commit()
+        finally:
+            self._depth -= 1
+
+    def init_db(self, progress=None):
+        """
+        Приводит схему к актуальной версии через реестр миграций.
+        Если схема актуальна, стоит чтения PRAGMA user_version и проверки
+        триггеров полнотекстового индекса.
+        """
+        with self.connection() as conn:
+            migrate(conn, progress)
+            # Полнотекстовый поиск доступен только в сборках SQLite с FTS5
+            self.fulltext = ensure_fulltext(conn)
+
+    def create_profile(self, login, password, hashed=None):
+        """
+        Создаёт профиль с базовыми категориями; False, если логин занят.
+        hashed — хеш пароля, заранее вычисленный в фоновом потоке.
+        """
+        if hashed is None:
+            hashed = hash_password(password, self.password_rounds)
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("INSERT INTO profiles (login, password) VALUES (?, ?)", (login, hashed))
                 conn.commit()
@@ -93,35 +190,135 @@ class Database:
         except sqlite3.IntegrityError:
             return False
 
+    def password_hash(self, login=None, profile_id=None):
+        """(id профиля, хеш пароля) по логину или id; None, если профиля нет."""
+        with self.connection() as conn:
+            if profile_id is not None:
+                return conn.execute("SELECT id, password FROM profiles WHERE id = ?", (profile_id,)).fetchone()
+            return conn.execute("SELECT id, password FROM profiles WHERE login = ?", (login,)).fetchone()
+
+    def set_password_hash(self, profile_id, hashed):
+        with self.connection() as conn:
+            conn.execute("UPDATE profiles SET password = ? WHERE id = ?", (hashed, profile_id))
+
     def authenticate(self, login, password):
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id, password FROM profiles WHERE login = ?", (login,))
-            result = cursor.fetchone()
-            if result and bcrypt.checkpw(password.encode('utf-8'), result[1]):
-                return result[0]
+        """
+        Проверяет логин и пароль; возвращает id профиля или None.
+        Хеш с устаревшей стоимостью пересчитывается с password_rounds.
+        """
+        result = self.password_hash(login)
+        if result is None:
             return None
+        valid, rehashed = check_password(password, result[1], self.password_rounds)
+        if not valid:
+            return None
+        if rehashed is not None:
+            self.set_password_hash(result[0], rehashed)
+        return result[0]
 
-    def backup_db(self):
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_path = f"backups/finance_backup_{timestamp}.db"
-        os.makedirs(os.path.dirname(backup_path), exist_ok=True)
-        with sqlite3.connect(self.db_path) as conn:
-            with sqlite3.connect(backup_path) as backup:
-                conn.backup(backup)
-        return backup_path
+    def change_password(self, profile_id, old_password, new_password):
+        """Меняет пароль профиля; возвращает False, если старый пароль неверен."""
+        stored_password = self.password_hash(profile_id=profile_id)[1]
+        if not verify_password(old_password, stored_password):
+            return False
+        self.set_password_hash(profile_id, hash_password(new_password, self.password_rounds))
+        return True
 
-    def restore_db(self, backup_path):
+    def backup_db(self, progress=None, note=""):
+        """
+        Создаёт инкрементальный снимок базы и возвращает его манифест (см. BackupStore).
+        Журнал WAL переносится в основной файл, после чего файл читается
+        напрямую внутри транзакции чтения: пока она открыта, SQLite не
+        переписывает основной файл. Если перенести журнал не удалось (его
+        удерживает фоновое чтение), снимок делается с копии через backup API.
+        progress(title, done, total) сообщает о ходе создания снимка.
+        """
+        with self.connection() as conn:
+            busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+            if busy:
+                return self.backup_from(conn, progress, note=note, pages=-1, pause=0)
+            conn.execute("BEGIN")
+            try:
+                page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+                page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+                return self.backups.add_file(self.db_path, page_count * page_size,
+                                             self._store_progress(progress), note=note)
+            finally:
+                conn.rollback()
+
+    def backup_from(self, conn, progress=None, cancelled=None, note="", pages=None, pause=None):
+        """
+        Создаёт снимок через пошаговый backup API из соединения conn (например,
+        соединения фонового читателя). Копирование идёт по pages страниц с паузой
+        pause секунд между шагами, поэтому запросы интерфейса не простаивают.
+        Всё копирование выполняется в одной транзакции чтения: запись в базу
+        во время копирования не перезапускает его. Если cancelled() возвращает
+        True, копирование прерывается с BackupCancelled.
+        """
+        import tempfile
+        from backup_store import BackupCancelled
+
+        pages = self.BACKUP_STEP_PAGES if pages is None else pages
+        pause = self.BACKUP_STEP_PAUSE if pause is None else pause
+
+        def check():
+            if cancelled is not None and cancelled():
+                raise BackupCancelled()
+
+        def step(status, remaining, total):
+            if progress:
+                progress("Копирование базы", total - remaining, total)
+            check()
+            time.sleep(pause)
+
+        os.makedirs(self.backup_dir, exist_ok=True)
+        fd, copy_path = tempfile.mkstemp(suffix=".db.part", dir=self.backup_dir)
+        os.close(fd)
+        try:
+            conn.execute("BEGIN")
+            try:
+                conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+                with closing(sqlite3.connect(copy_path)) as backup:
+                    conn.backup(backup, pages=pages, progress=step)
+            finally:
+                conn.rollback()
+
+            def store_progress(title, done, total):
+                if progress:
+                    progress(title, done, total)
+                check()
+
+            return self.backups.add_file(copy_path, progress=self._store_progress(store_progress), note=note)
+        finally:
+            os.remove(copy_path)
+
+    @staticmethod
+    def _store_progress(progress):
+        if progress is None:
+            return None
+        return lambda done, total: progress("Сохранение снимка", done, total)
+
+    def restore_snapshot(self, snapshot_id, progress=None):
+        """Восстанавливает базу из инкрементального снимка."""
+        snapshot_path = f"{self.db_path}.snapshot"
+        self.backups.restore(snapshot_id, snapshot_path)
+        try:
+            self.restore_db(snapshot_path, progress)
+        finally:
+            os.remove(snapshot_path)
+
+    def restore_db(self, backup_path, progress=None):
         """
         Восстанавливает базу данных из файла резервной копии.
-        Проверяет валидность файла и заменяет текущую базу.
+        Проверяет валидность файла, заменяет текущую базу и обновляет
+        схему старых копий теми же миграциями, что и при запуске.
         """
         if not os.path.exists(backup_path):
             raise FileNotFoundError("Файл резервной копии не найден")
 
         # Проверка, является ли файл действительной SQLite-базой
         try:
-            with sqlite3.connect(backup_path) as conn:
+            with closing(sqlite3.connect(backup_path)) as conn:
                 cursor = conn.cursor()
                 # Проверяем наличие всех необходимых таблиц
                 required_tables = ['profiles', 'categories', 'transactions', 'limits']
@@ -130,17 +327,16 @@ class Database:
                 if not all(table in tables for table in required_tables):
                     raise ValueError("Файл резервной копии не содержит всех необходимых таблиц")
 
-                # Проверяем схему таблицы limits на наличие столбца period
-                cursor.execute("PRAGMA table_info(limits)")
-                columns = [info[1] for info in cursor.fetchall()]
-                if 'period' not in columns:
-                    raise ValueError("Таблица limits в резервной копии не содержит столбец period")
+                # Копии старых версий обновятся миграциями, более новые не поддерживаются
+                cursor.execute("PRAGMA user_version")
+                if cursor.fetchone()[0] > SCHEMA_VERSION:
+                    raise ValueError("Резервная копия создана более новой версией приложения")
         except sqlite3.Error as e:
             raise ValueError(f"Недействительный файл SQLite: {str(e)}")
 
-        # Создаем резервную копию текущей базы перед восстановлением
+        # Создаем снимок текущей базы перед восстановлением
         try:
-            temp_backup_path = self.backup_db()
+            safety_snapshot = self.backup_db(note="перед восстановлением")["id"]
         except Exception as e:
             raise RuntimeError(f"Не удалось создать временную резервную копию: {str(e)}")
 
@@ -152,19 +348,31 @@ class Database:
             shutil.copyfile(backup_path, self.db_path)
         except Exception as e:
             # Восстанавливаем временную копию в случае ошибки
-            shutil.copyfile(temp_backup_path, self.db_path)
+            self.backups.restore(safety_snapshot, self.db_path)
             raise RuntimeError(f"Ошибка при копировании файла резервной копии: {str(e)}")
 
-        # Повторно инициализируем базу для проверки целостности
+        # Обновляем схему восстановленной базы и проверяем её целостность
         try:
-            self.init_db()
+            self.init_db(progress)
         except Exception as e:
             # Восстанавливаем временную копию в случае ошибки
-            shutil.copyfile(temp_backup_path, self.db_path)
+            self.close()
+            self.backups.restore(safety_snapshot, self.db_path)
             self.init_db()
             raise RuntimeError(f"Ошибка при инициализации восстановленной базы: {str(e)}")
+        finally:
+            # Данные в памяти больше не соответствуют файлу базы
+            self.bump_data_version()
+            for cache in self._category_caches.values():
+                cache.reload()
 
     def close(self):
-        # SQLite автоматически закрывает соединение при выходе из контекста,
-        # но для явной очистки можно добавить дополнительные действия, если нужно
-        pass
\ No newline at end of file
+        # Сначала закрываем фоновых читателей: они не должны удерживать старый файл базы
+        # (например, при восстановлении), а журнал WAL переносится последним закрытым соединением
+        self.close_readers()
+        # Закрываем соединение; при закрытии SQLite переносит журнал WAL в основной файл
+        if self._conn is not None:
+            # Обновляем статистику планировщика по накопленным запросам
+            self._conn.execute("PRAGMA optimize")
+            self._conn.close()
+            self._conn = None
\ No newline at end of file
@@ -0,0 +1,165 @@
+# exporters.py
+"""
+Потоковый экспорт операций.
+
+Строки читаются из курсора порциями fetchmany и сразу дописываются в файл,
+поэтому расход памяти не зависит от объёма экспорта. Файл пишется во
+временный путь и переименовывается только после успешного завершения:
+отменённый или прерванный ошибкой экспорт не оставляет неполного файла.
+
+Экспорт можно запускать без интерфейса:
+    python exporters.py out.xlsx --profile login --from 2025-01-01 --to 2025-12-31 --type Расходы
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+from contextlib import closing
+from datetime import date
+from services import StatsService, TYPE_FILTERS
+
+EXPORT_HEADER = ["Дата", "Категория", "Тип", "Сумма", "Описание"]
+# Строк в одной порции fetchmany
+CHUNK_SIZE = 2000
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def iter_chunks(cursor, chunk_size=CHUNK_SIZE):
+    """Порции строк курсора до его исчерпания."""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def write_csv(path, chunks):
+    """Записывает CSV по порциям; chunks — итератор списков строк."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(EXPORT_HEADER)
+        for rows in chunks:
+            writer.writerows(rows)
+
+
+def write_xlsx(path, chunks):
+    """
+    Записывает XLSX в потоковом режиме openpyxl (write_only): строки сразу
+    сбрасываются в файл листа. Даты и суммы пишутся типизированными ячейками.
+    """
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Transactions")
+    ws.append(EXPORT_HEADER)
+    try:
+        for rows in chunks:
+            for row in rows:
+                ws.append((date.fromisoformat(row[0]), *row[1:]))
+    finally:
+        # save закрывает поток листа и удаляет его временный файл и при отмене;
+        # неполный файл затем удаляет export_transactions
+        wb.save(path)
+
+
+# Формат экспорта -> функция записи файла
+WRITERS = {
+    "csv": write_csv,
+    "xlsx": write_xlsx,
+}
+
+
+def count_rows(conn, profile_id, start_day, end_day, type_filter=None):
+    query, params = StatsService.export_query(profile_id, start_day, end_day, type_filter)
+    return conn.execute(f"SELECT COUNT(*) FROM ({query})", params).fetchone()[0]
+
+
+def export_transactions(conn, path, format_, profile_id, start_day, end_day, type_filter=None,
+                        progress=None, cancelled=None, chunk_size=CHUNK_SIZE):
+    """
+    Экспортирует операции профиля за период [start_day, end_day) в файл path.
+    progress(done, total) вызывается после каждой порции; если cancelled()
+    возвращает True, экспорт останавливается с ExportCancelled.
+    Возвращает число записанных строк; если строк нет, файл не создаётся и возвращается 0.
+    """
+    if format_ not in WRITERS:
+        raise ValueError(f"Неизвестный формат экспорта: {format_}")
+    total = count_rows(conn, profile_id, start_day, end_day, type_filter)
+    if not total:
+        return 0
+    query, params = StatsService.export_query(profile_id, start_day, end_day, type_filter)
+    done = 0
+
+    def chunks():
+        nonlocal done
+        with closing(conn.execute(query, params)) as cursor:
+            for rows in iter_chunks(cursor, chunk_size):
+                if cancelled is not None and cancelled():
+                    raise ExportCancelled()
+                yield rows
+                done += len(rows)
+                if progress:
+                    progress(done, total)
+
+    # Уникальное имя: одновременные экспорты в один файл и остатки прерванного экспорта не мешают друг другу
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".part")
+    os.close(fd)
+    try:
+        WRITERS[format_](temp_path, chunks())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return done
+
+
+def main(argv=None):
+    from database import Database
+    from units import day_number
+
+    parser = argparse.ArgumentParser(description="Экспорт операций профиля без интерфейса")
+    parser.add_argument("path", help="файл экспорта (.csv или .xlsx)")
+    parser.add_argument("--profile", required=True, help="логин профиля")
+    parser.add_argument("--db", default="db/finance.db", help="путь к базе данных")
+    parser.add_argument("--from", dest="date_from", help="первая дата периода, yyyy-mm-dd")
+    parser.add_argument("--to", dest="date_to", help="последняя дата периода, yyyy-mm-dd")
+    parser.add_argument("--type", dest="type_filter", choices=list(TYPE_FILTERS), help="только доходы или расходы")
+    parser.add_argument("--format", dest="format_", choices=list(WRITERS),
+                        help="формат файла; по умолчанию — по расширению")
+    args = parser.parse_args(argv)
+
+    format_ = args.format_ or os.path.splitext(args.path)[1].lstrip(".").lower()
+    if format_ not in WRITERS:
+        parser.error(f"неизвестный формат экспорта: {format_}")
+    start_day = day_number(args.date_from) if args.date_from else None
+    end_day = day_number(args.date_to) + 1 if args.date_to else None
+
+    db = Database(args.db)
+    try:
+        with db.connection() as conn:
+            row = conn.execute("SELECT id FROM profiles WHERE login = ?", (args.profile,)).fetchone()
+            if row is None:
+                print(f"Профиль {args.profile} не найден", file=sys.stderr)
+                return 1
+
+            def report(done, total):
+                print(f"\rЭкспортировано {done} из {total}", end="", file=sys.stderr)
+
+            count = export_transactions(conn, args.path, format_, row[0], start_day, end_day,
+                                        args.type_filter, progress=report)
+        if not count:
+            print("Нет данных для экспорта", file=sys.stderr)
+            return 1
+        print(f"\nГотово: {count} строк в {args.path}", file=sys.stderr)
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,43 @@
 # main.py
 import sys
+import threading
 from PyQt5.QtWidgets import QApplication
 from auth import AuthDialog
-from main_window import MainWindow
 from database import Database
 
+# Модули, которые не нужны окну входа: загружаются в фоне, пока пользователь вводит логин и пароль
+PRELOAD_MODULES = (
+    "bcrypt",
+    "main_window",
+    "transactions",
+    "categories",
+    "budget",
+    "settings",
+    "PyQt5.QtChart",
+    "numpy",
+    "app_statistics",
+    "openpyxl",
+)
+
+
+def preload_modules():
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError as e:
+            # Необязательные зависимости (numpy) могут отсутствовать
+            print(f"Предзагрузка {name} пропущена: {e}")
+
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     db = Database()
+    threading.Thread(target=preload_modules, name="preload", daemon=True).start()
 
     while True:
         auth_dialog = AuthDialog(db)
         if auth_dialog.exec_() == AuthDialog.Accepted:
+            from main_window import MainWindow
             main_window = MainWindow(db, auth_dialog.profile_id, auth_dialog.login_input.text())
             main_window.logout_signal.connect(lambda: None)
             main_window.show()
@@ -2,21 +2,40 @@
 from PyQt5.QtWidgets import QMainWindow, QTabWidget, QVBoxLayout, QWidget, QPushButton, QHBoxLayout
 from PyQt5.QtGui import QFont
 from PyQt5.QtCore import pyqtSignal
-from transactions import TransactionsTab
-from categories import CategoriesTab
-from app_statistics import StatisticsTab
-from budget import BudgetTab
-from settings import SettingsTab
+import importlib
+from backup_scheduler import BackupScheduler
+
+# Вкладки окна: имя, заголовок, модуль и класс. Вкладка создаётся при первом открытии,
+# её модуль (с диаграммами, экспортом и т. п.) импортируется тогда же
+TABS = {
+    "transactions": ("Операции", "transactions", "TransactionsTab"),
+    "categories": ("Категории", "categories", "CategoriesTab"),
+    "statistics": ("Статистика", "app_statistics", "StatisticsTab"),
+    "budget": ("Бюджет", "budget", "BudgetTab"),
+    "settings": ("Настройки", "settings", "SettingsTab"),
+}
+TAB_NAMES = list(TABS)
+# Метод полной перезагрузки данных вкладки
+REFRESH_METHODS = {
+    "transactions": "load_transactions",
+    "statistics": "update_all",
+    "budget": "load_limits",
+}
+# Вкладки, которые учитывают изменения операций через apply_change
+CHANGE_LISTENERS = ("statistics", "budget")
 
 class MainWindow(QMainWindow):
     logout_signal = pyqtSignal()
-    data_updated = pyqtSignal()
+    data_updated = pyqtSignal(object)  # TransactionChange
 
     def __init__(self, db, profile_id, login):
         super().__init__()
         self.db = db
         self.profile_id = profile_id
         self.login = login
+        # Автоматические снимки базы в фоне: после серии изменений, ежедневно и при выходе
+        self.backup_scheduler = BackupScheduler(db, parent=self)
+        self.backup_scheduler.start_timer()
         self.init_ui()
 
     def init_ui(self):
@@ -34,30 +53,119 @@ class MainWindow(QMainWindow):
         header_layout.addStretch()
         header_layout.addWidget(exit_btn)
         layout.addLayout(header_layout)
-        tabs = QTabWidget()
-        tabs.setStyleSheet("""
+        self.tabs = QTabWidget()
+        self.tabs.setStyleSheet("""
             QTabBar::tab {
                 height: 40px;
                 width: 150px;
                 font-size: 14pt;  /* Увеличиваем шрифт названий вкладок */
             }
         """)
-        self.transactions_tab = TransactionsTab(self.db, self.profile_id)
-        self.categories_tab = CategoriesTab(self.db, self.profile_id)
-        self.statistics_tab = StatisticsTab(self.db, self.profile_id)
-        self.budget_tab = BudgetTab(self.db, self.profile_id)
-        self.settings_tab = SettingsTab(self.db, self.profile_id)
-        self.categories_tab.category_updated.connect(self.transactions_tab.update_categories)
-        self.categories_tab.category_updated.connect(self.transactions_tab.load_transactions)
-        self.transactions_tab.transaction_updated.connect(self.data_updated)
-        self.data_updated.connect(self.statistics_tab.update_all)
-        self.transactions_tab.transaction_updated.connect(self.budget_tab.load_limits)
-        tabs.addTab(self.transactions_tab, "Операции")
-        tabs.addTab(self.categories_tab, "Категории")
-        tabs.addTab(self.statistics_tab, "Статистика")
-        tabs.addTab(self.budget_tab, "Бюджет")
-        tabs.addTab(self.settings_tab, "Настройки")
-        layout.addWidget(tabs)
+        # Вкладки создаются при первом открытии, до этого в них пустые страницы-контейнеры
+        self._tabs = {}
+        self._pages = {}
+        # Созданные, но скрытые вкладки, данные которых устарели: обновляются при показе
+        self.dirty = set()
+        for name, (title, _, _) in TABS.items():
+            page = QWidget()
+            page_layout = QVBoxLayout(page)
+            page_layout.setContentsMargins(0, 0, 0, 0)
+            self._pages[name] = page
+            self.tabs.addTab(page, title)
+        # Списки категорий во вкладках обновляются через общий кэш категорий (Database.category_cache)
+        self.data_updated.connect(self.dispatch_change)
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        layout.addWidget(self.tabs)
+        self.on_tab_changed(self.tabs.currentIndex())
+
+    def tab(self, name):
+        """Вкладка по имени; создаётся при первом обращении."""
+        widget = self._tabs.get(name)
+        if widget is None:
+            _, module_name, class_name = TABS[name]
+            tab_class = getattr(importlib.import_module(module_name), class_name)
+            widget = tab_class(self.db, self.profile_id)
+            self._tabs[name] = widget
+            self._pages[name].layout().addWidget(widget)
+            if name == "transactions":
+                widget.transaction_updated.connect(self.data_updated)
+            elif name == "settings":
+                widget.database_restored.connect(self.refresh_all)
+                widget.restore_running.connect(self.pause_for_restore)
+                widget.set_backup_scheduler(self.backup_scheduler)
+        return widget
+
+    @property
+    def transactions_tab(self):
+        return self.tab("transactions")
+
+    @property
+    def categories_tab(self):
+        return self.tab("categories")
+
+    @property
+    def statistics_tab(self):
+        return self.tab("statistics")
+
+    @property
+    def budget_tab(self):
+        return self.tab("budget")
+
+    @property
+    def settings_tab(self):
+        return self.tab("settings")
+
+    def current_tab_name(self):
+        return TAB_NAMES[self.tabs.currentIndex()]
+
+    def on_tab_changed(self, index):
+        name = TAB_NAMES[index]
+        self.tab(name)
+        if name in self.dirty:
+            self.dirty.discard(name)
+            self.refresh(name)
+
+    def refresh(self, name):
+        getattr(self._tabs[name], REFRESH_METHODS[name])()
+
+    def dispatch_change(self, change):
+        """
+        Передаёт изменение операции открытой вкладке; скрытые вкладки только
+        помечаются устаревшими и обновляются при переключении на них.
+        Ещё не созданные вкладки пропускаются: они загрузят актуальные данные сами.
+        """
+        current = self.current_tab_name()
+        for name in CHANGE_LISTENERS:
+            widget = self._tabs.get(name)
+            if widget is None:
+                continue
+            if name == current:
+                widget.apply_change(change)
+            else:
+                # Скрытая вкладка может учесть изменение без перерисовки (например, в движке аналитики)
+                track_change = getattr(widget, "track_change", None)
+                if track_change is not None:
+                    track_change(change)
+                self.dirty.add(name)
+
+    def refresh_all(self):
+        """После замены базы (восстановление копии) устаревают все созданные вкладки."""
+        self.dirty.update(name for name in self._tabs if name in REFRESH_METHODS)
+        current = self.current_tab_name()
+        if current in self.dirty:
+            self.dirty.discard(current)
+            self.refresh(current)
+
+    def pause_for_restore(self, running):
+        """Останавливает таймеры, которые могут обратиться к базе, пока она заменяется копией."""
+        if running:
+            self.backup_scheduler.pause()
+            for widget in self._tabs.values():
+                load_timer = getattr(widget, "load_timer", None)
+                if load_timer is not None:
+                    load_timer.stop()
+        else:
+            self.backup_scheduler.start_timer()
 
     def logout(self):
         print("Выход из приложения...")
@@ -66,4 +174,9 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         print("Закрытие окна...")
+        self.backup_scheduler.shutdown()
+        # Вкладки закрытого окна больше не обращаются к базе: закрываем их соединения
+        # фоновых запросов и отписываем их от кэша категорий
+        self.db.close_readers()
+        self.db.category_cache(self.profile_id).clear_listeners()
         event.accept()
\ No newline at end of file
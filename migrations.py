@@ -0,0 +1,382 @@
+# migrations.py
+"""
+Версионированные миграции схемы базы данных.
+
+Номер текущей версии схемы хранится в PRAGMA user_version. Каждая миграция
+применяется ровно один раз; все недостающие миграции выполняются в одной
+транзакции, поэтому база никогда не остаётся в промежуточном состоянии.
+"""
+import sqlite3
+from units import JULIAN_DAY_OFFSET
+
+# Размер порции строк при перезаписи больших таблиц
+MIGRATION_CHUNK_SIZE = 10000
+
+
+def _create_base_schema(conn, report):
+    cursor = conn.cursor()
+    # Таблица профилей
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            login TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+    """)
+    # Таблица категорий
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL CHECK(type IN ('Доход', 'Расход')),
+            UNIQUE(profile_id, name),
+            FOREIGN KEY(profile_id) REFERENCES profiles(id)
+        )
+    """)
+    # Таблица операций
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER,
+            date TEXT NOT NULL,
+            category_id INTEGER,
+            type TEXT NOT NULL CHECK(type IN ('Доход', 'Расход')),
+            amount REAL NOT NULL,
+            description TEXT,
+            FOREIGN KEY(profile_id) REFERENCES profiles(id),
+            FOREIGN KEY(category_id) REFERENCES categories(id)
+        )
+    """)
+    # Таблица лимитов
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS limits (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER,
+            category_id INTEGER,
+            amount REAL NOT NULL,
+            period TEXT DEFAULT 'Месяц' CHECK(period IN ('Неделя', 'Месяц', 'Год')),
+            FOREIGN KEY(profile_id) REFERENCES profiles(id),
+            FOREIGN KEY(category_id) REFERENCES categories(id)
+        )
+    """)
+    # Старые базы и резервные копии могут не содержать столбец period
+    cursor.execute("PRAGMA table_info(limits)")
+    columns = [info[1] for info in cursor.fetchall()]
+    if 'period' not in columns:
+        cursor.execute("""
+            ALTER TABLE limits ADD COLUMN period TEXT DEFAULT 'Месяц' CHECK(period IN ('Неделя', 'Месяц', 'Год'))
+        """)
+
+
+def _create_indexes(conn, report):
+    cursor = conn.cursor()
+    # Индексы для фильтров по профилю, периоду, типу и категории
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_profile_date
+        ON transactions(profile_id, date)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_profile_category
+        ON transactions(profile_id, category_id, type, date)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_transactions_profile_type
+        ON transactions(profile_id, type, date)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_limits_profile_category
+        ON limits(profile_id, category_id, period)
+    """)
+
+
+def _integer_amounts_and_days(conn, report):
+    """
+    Переводит суммы операций и лимитов в целые копейки и добавляет к операциям
+    индексируемый номер дня (day = date.toordinal()).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'")
+    row = cursor.fetchone()
+    last_id = row[0] if row else 0
+    cursor.execute("""
+        CREATE TABLE transactions_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER,
+            date TEXT NOT NULL,
+            day INTEGER NOT NULL,
+            category_id INTEGER,
+            type TEXT NOT NULL CHECK(type IN ('Доход', 'Расход')),
+            amount INTEGER NOT NULL,
+            description TEXT,
+            FOREIGN KEY(profile_id) REFERENCES profiles(id),
+            FOREIGN KEY(category_id) REFERENCES categories(id)
+        )
+    """)
+    # Переносим строки порциями, чтобы показывать ход миграции на больших базах
+    total = cursor.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    copied = 0
+    after_id = -1
+    while True:
+        cursor.execute(f"""
+            INSERT INTO transactions_new (id, profile_id, date, day, category_id, type, amount, description)
+            SELECT id, profile_id, date, CAST(julianday(date) - {JULIAN_DAY_OFFSET} AS INTEGER),
+                   category_id, type, CAST(ROUND(amount * 100) AS INTEGER), description
+            FROM transactions WHERE id > ? ORDER BY id LIMIT ?
+        """, (after_id, MIGRATION_CHUNK_SIZE))
+        if cursor.rowcount <= 0:
+            break
+        copied += cursor.rowcount
+        after_id = cursor.execute("SELECT MAX(id) FROM transactions_new").fetchone()[0]
+        report(0.9 * copied / total)
+    cursor.execute("DROP TABLE transactions")
+    cursor.execute("ALTER TABLE transactions_new RENAME TO transactions")
+    # Сохраняем счётчик AUTOINCREMENT, чтобы не переиспользовать номера удалённых операций
+    cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'transactions'", (last_id,))
+    cursor.execute("""
+        CREATE INDEX idx_transactions_profile_day
+        ON transactions(profile_id, day)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_transactions_profile_category
+        ON transactions(profile_id, category_id, type, day)
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_transactions_profile_type
+        ON transactions(profile_id, type, day)
+    """)
+
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'limits'")
+    row = cursor.fetchone()
+    last_id = row[0] if row else 0
+    cursor.execute("""
+        CREATE TABLE limits_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            profile_id INTEGER,
+            category_id INTEGER,
+            amount INTEGER NOT NULL,
+            period TEXT DEFAULT 'Месяц' CHECK(period IN ('Неделя', 'Месяц', 'Год')),
+            FOREIGN KEY(profile_id) REFERENCES profiles(id),
+            FOREIGN KEY(category_id) REFERENCES categories(id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO limits_new (id, profile_id, category_id, amount, period)
+        SELECT id, profile_id, category_id, CAST(ROUND(amount * 100) AS INTEGER), period FROM limits
+    """)
+    cursor.execute("DROP TABLE limits")
+    cursor.execute("ALTER TABLE limits_new RENAME TO limits")
+    cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'limits'", (last_id,))
+    cursor.execute("""
+        CREATE INDEX idx_limits_profile_category
+        ON limits(profile_id, category_id, period)
+    """)
+    report(1.0)
+
+
+# Триггеры, поддерживающие полнотекстовый индекс в актуальном состоянии
+FULLTEXT_TRIGGERS = {
+    "transactions_fts_insert": """
+        CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO transactions_fts (rowid, description, category)
+            VALUES (new.id, COALESCE(new.description, ''),
+                    (SELECT name FROM categories WHERE id = new.category_id));
+        END
+    """,
+    "transactions_fts_delete": """
+        CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN
+            DELETE FROM transactions_fts WHERE rowid = old.id;
+        END
+    """,
+    "transactions_fts_update": """
+        CREATE TRIGGER transactions_fts_update AFTER UPDATE OF description, category_id ON transactions BEGIN
+            UPDATE transactions_fts
+            SET description = COALESCE(new.description, ''),
+                category = (SELECT name FROM categories WHERE id = new.category_id)
+            WHERE rowid = new.id;
+        END
+    """,
+    "categories_fts_rename": """
+        CREATE TRIGGER categories_fts_rename AFTER UPDATE OF name ON categories BEGIN
+            UPDATE transactions_fts SET category = new.name
+            WHERE rowid IN (SELECT id FROM transactions
+                            WHERE profile_id = new.profile_id AND category_id = new.id);
+        END
+    """,
+}
+
+
+def fulltext_supported(conn):
+    """Есть ли в сборке SQLite модуль FTS5."""
+    try:
+        return conn.execute("SELECT 1 FROM pragma_module_list WHERE name = 'fts5'").fetchone() is not None
+    except sqlite3.Error:
+        return False
+
+
+def ensure_fulltext(conn, report=None):
+    """
+    Приводит полнотекстовый индекс операций в соответствие с возможностями SQLite.
+    При наличии FTS5 создаёт таблицу transactions_fts и триггеры (заполняя индекс
+    заново, если триггеров не было); без FTS5 удаляет триггеры, чтобы запись
+    операций не зависела от отсутствующего модуля. Возвращает True, если индекс доступен.
+    """
+    triggers = {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name IN ({})".format(
+            ", ".join("?" * len(FULLTEXT_TRIGGERS))
+        ), list(FULLTEXT_TRIGGERS)
+    )}
+    if not fulltext_supported(conn):
+        for name in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+        return False
+    if len(triggers) == len(FULLTEXT_TRIGGERS):
+        return True
+
+    # Индекс отсутствует или устарел (база открывалась без FTS5) — строим заново
+    conn.execute("DROP TABLE IF EXISTS transactions_fts")
+    conn.execute("CREATE VIRTUAL TABLE transactions_fts USING fts5(description, category)")
+    total = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    copied = 0
+    after_id = -1
+    while True:
+        last_id = conn.execute(
+            "SELECT MAX(id) FROM (SELECT id FROM transactions WHERE id > ? ORDER BY id LIMIT ?)",
+            (after_id, MIGRATION_CHUNK_SIZE)
+        ).fetchone()[0]
+        if last_id is None:
+            break
+        cursor = conn.execute("""
+            INSERT INTO transactions_fts (rowid, description, category)
+            SELECT t.id, COALESCE(t.description, ''), c.name
+            FROM transactions t LEFT JOIN categories c ON t.category_id = c.id
+            WHERE t.id > ? AND t.id <= ?
+        """, (after_id, last_id))
+        copied += cursor.rowcount
+        after_id = last_id
+        if report:
+            report(0.9 * copied / total)
+    for name in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    for sql in FULLTEXT_TRIGGERS.values():
+        conn.execute(sql)
+    if report:
+        report(1.0)
+    return True
+
+
+def _fulltext_search(conn, report):
+    ensure_fulltext(conn, report)
+
+
+def _daily_totals(conn, report):
+    """
+    Добавляет таблицу дневных итогов по категориям и типам. Триггеры
+    поддерживают её при любом изменении операций, поэтому статистика и
+    бюджет читают несколько тысяч агрегатов вместо всех операций.
+    Операции без категории учитываются с category_id = 0.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE daily_totals (
+            profile_id INTEGER NOT NULL,
+            day INTEGER NOT NULL,
+            category_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (profile_id, day, category_id, type)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        INSERT INTO daily_totals (profile_id, day, category_id, type, amount, count)
+        SELECT COALESCE(profile_id, 0), day, COALESCE(category_id, 0), type, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY 1, 2, 3, 4
+    """)
+    report(0.9)
+    add_new = """
+        INSERT INTO daily_totals (profile_id, day, category_id, type, amount, count)
+        VALUES (COALESCE(new.profile_id, 0), new.day, COALESCE(new.category_id, 0), new.type, new.amount, 1)
+        ON CONFLICT (profile_id, day, category_id, type)
+        DO UPDATE SET amount = amount + excluded.amount, count = count + 1;
+    """
+    remove_old = """
+        UPDATE daily_totals SET amount = amount - old.amount, count = count - 1
+        WHERE profile_id = COALESCE(old.profile_id, 0) AND day = old.day
+        AND category_id = COALESCE(old.category_id, 0) AND type = old.type;
+        DELETE FROM daily_totals
+        WHERE profile_id = COALESCE(old.profile_id, 0) AND day = old.day
+        AND category_id = COALESCE(old.category_id, 0) AND type = old.type AND count = 0;
+    """
+    cursor.execute(f"""
+        CREATE TRIGGER daily_totals_insert AFTER INSERT ON transactions BEGIN
+            {add_new}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER daily_totals_delete AFTER DELETE ON transactions BEGIN
+            {remove_old}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER daily_totals_update
+        AFTER UPDATE OF profile_id, day, category_id, type, amount ON transactions BEGIN
+            {remove_old}
+            {add_new}
+        END
+    """)
+    report(1.0)
+
+
+# Реестр миграций: (версия, описание, функция). Новые миграции добавляются в конец.
+MIGRATIONS = [
+    (1, "Базовая схема", _create_base_schema),
+    (2, "Индексы операций и лимитов", _create_indexes),
+    (3, "Суммы в копейках и номера дней", _integer_amounts_and_days),
+    (4, "Полнотекстовый поиск по операциям", _fulltext_search),
+    (5, "Дневные итоги для статистики", _daily_totals),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, progress=None):
+    """
+    Приводит схему базы к SCHEMA_VERSION.
+    progress(title, fraction) вызывается перед каждой миграцией и по ходу
+    длительных перезаписей данных; fraction — общая доля выполнения от 0 до 1.
+    Возвращает итоговую версию схемы.
+    """
+    version = schema_version(conn)
+    if version > SCHEMA_VERSION:
+        raise ValueError(
+            f"База данных создана более новой версией приложения (схема {version}, поддерживается {SCHEMA_VERSION})"
+        )
+    pending = [migration for migration in MIGRATIONS if migration[0] > version]
+    if not pending:
+        return version
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for step, (number, title, apply) in enumerate(pending):
+            def report(fraction, title=title, step=step):
+                if progress:
+                    progress(title, (step + fraction) / len(pending))
+
+            report(0.0)
+            apply(conn, report)
+            conn.execute(f"PRAGMA user_version = {number}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    if progress:
+        progress("Готово", 1.0)
+    return SCHEMA_VERSION
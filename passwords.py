@@ -0,0 +1,63 @@
+# passwords.py
+"""
+Хеширование паролей bcrypt.
+
+Стоимость (число раундов, 2^rounds итераций) записана в самом хеше
+($2b$12$...), поэтому у каждого профиля она своя. После успешного входа
+хеш с устаревшей стоимостью пересчитывается с текущей (needs_rehash).
+Функции модуля не обращаются к базе и могут выполняться в фоновом потоке.
+"""
+import time
+
+# Стоимость по умолчанию совпадает с bcrypt.gensalt(); на текущем оборудовании
+# проверка занимает около 0,3 с. Подобрать значение помогает python perf_checks.py --bcrypt
+DEFAULT_ROUNDS = 12
+
+
+def _bytes(value):
+    return value.encode('utf-8') if isinstance(value, str) else value
+
+
+def hash_password(password, rounds=DEFAULT_ROUNDS):
+    import bcrypt  # загружается при первой работе с паролями, а не при запуске
+
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds))
+
+
+def verify_password(password, hashed):
+    import bcrypt
+
+    return bcrypt.checkpw(password.encode('utf-8'), _bytes(hashed))
+
+
+def hash_rounds(hashed):
+    """Стоимость, с которой вычислен хеш: $2b$12$... -> 12."""
+    return int(_bytes(hashed).split(b"$")[2])
+
+
+def needs_rehash(hashed, rounds=DEFAULT_ROUNDS):
+    return hash_rounds(hashed) != rounds
+
+
+def check_password(password, hashed, rounds=DEFAULT_ROUNDS):
+    """
+    Проверяет пароль и при необходимости пересчитывает хеш с текущей стоимостью.
+    Возвращает (верен ли пароль, новый хеш или None).
+    """
+    if not verify_password(password, hashed):
+        return False, None
+    if needs_rehash(hashed, rounds):
+        return True, hash_password(password, rounds)
+    return True, None
+
+
+def benchmark(rounds_range=range(10, 15), repeats=3):
+    """{стоимость: среднее время проверки пароля в мс}."""
+    results = {}
+    for rounds in rounds_range:
+        hashed = hash_password("benchmark", rounds)
+        started = time.perf_counter()
+        for _ in range(repeats):
+            verify_password("benchmark", hashed)
+        results[rounds] = (time.perf_counter() - started) / repeats * 1000
+    return results
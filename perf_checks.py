@@ -0,0 +1,271 @@
+# perf_checks.py
+"""
+Проверки производительности, запускаемые вручную: python perf_checks.py
+
+Проверка планов запросов строит временную базу и выполняет EXPLAIN QUERY PLAN
+для рабочих запросов приложения. Если какой-либо запрос читает таблицу
+transactions или daily_totals полным перебором, скрипт завершается с ненулевым кодом.
+
+Проверка импорта запускает "python -X importtime -c 'import main'" и требует,
+чтобы до окна входа не загружались диаграммы, NumPy, openpyxl, bcrypt и
+хранилище резервных копий, а
+общее время импорта укладывалось в STARTUP_IMPORT_BUDGET_MS.
+
+python perf_checks.py --ui дополнительно замеряет построение главного окна,
+создание вкладок и стоимость применения одного изменения операции.
+
+python perf_checks.py --backup замеряет фоновую резервную копию и задержку
+запросов интерфейса во время неё с паузами между шагами копирования и без них.
+
+python perf_checks.py --bcrypt выводит время проверки пароля для разных
+стоимостей bcrypt, чтобы подобрать passwords.DEFAULT_ROUNDS под оборудование.
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import passwords
+from database import Database
+from repository import TransactionRepository
+from services import BudgetService, StatsService
+
+# Таблицы (и их псевдонимы в запросах), полный перебор которых недопустим
+INDEXED_TABLES = ("transactions", "t", "daily_totals", "d")
+
+# Рабочие запросы вкладок в том виде, в котором их строят репозитории и сервисы
+PRODUCTION_QUERIES = {
+    "transactions: фильтр по типу, категории и периоду": TransactionRepository(None).build_list_query(
+        1, type_="Расход", category_id=3, start_day=739252, end_day=739283, sort="date"
+    ),
+    "transactions: следующая страница списка": TransactionRepository(None).build_list_query(
+        1, after=(739252, 100), limit=TransactionRepository.PAGE_SIZE
+    ),
+    "transactions: поиск по описанию без FTS5": TransactionRepository(None).build_list_query(
+        1, search="кофе", start_day=739252
+    ),
+    "transactions: полнотекстовый поиск": TransactionRepository(None, fulltext=True).build_list_query(
+        1, search="кофе лат", limit=TransactionRepository.PAGE_SIZE
+    ),
+    "budget: остатки всех лимитов": BudgetService(None).build_query(1, date(2025, 1, 15)),
+    "statistics: экспорт расходов за период": StatsService.export_query(1, 739252, 739283, "Расходы"),
+    "statistics: экспорт всех операций": StatsService.export_query(1, None, None),
+    "statistics: сводка": StatsService.totals_query(1, 739252, 739283),
+    "statistics: круговая диаграмма": StatsService.by_category_query(1, 739252, 739283, "Расходы"),
+    "statistics: гистограмма по датам": StatsService.daily_query(1, 739252, 739283),
+    "statistics: гистограмма по месяцам": StatsService.buckets_query(1, 738886, 739982, "month"),
+}
+
+# Запросы, требующие индекса FTS5; пропускаются, если сборка SQLite его не поддерживает
+FULLTEXT_QUERIES = {"transactions: полнотекстовый поиск"}
+
+
+def full_scans(conn, query, params):
+    """Возвращает строки плана, в которых таблица операций читается перебором."""
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    scans = []
+    for row in plan:
+        detail = row[-1]
+        words = detail.split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in INDEXED_TABLES:
+            scans.append(detail)
+    return scans
+
+
+def check_query_plans():
+    failures = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "finance.db"))
+        try:
+            with db.connection() as conn:
+                for name, (query, params) in PRODUCTION_QUERIES.items():
+                    if name in FULLTEXT_QUERIES and not db.fulltext:
+                        print(f"SKIP {name}: SQLite без FTS5")
+                        continue
+                    scans = full_scans(conn, query, params)
+                    if scans:
+                        failures[name] = scans
+        finally:
+            db.close()
+    return failures
+
+# Модули, которых не должно быть среди импортов до показа окна входа
+DEFERRED_MODULES = ("PyQt5.QtChart", "numpy", "openpyxl", "bcrypt", "main_window", "backup_store")
+# Бюджет времени импорта main (лучший из нескольких запусков)
+STARTUP_IMPORT_BUDGET_MS = 150
+
+
+def import_times(module="main"):
+    """{модуль: накопленное время импорта в мс} по выводу python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def check_startup_imports(runs=3):
+    failures = []
+    best = None
+    for _ in range(runs):
+        times = import_times()
+        loaded = [name for name in DEFERRED_MODULES if name in times]
+        if loaded:
+            failures.append(f"до окна входа загружены {', '.join(loaded)}")
+            break
+        best = times["main"] if best is None else min(best, times["main"])
+    if best is not None:
+        print(f"Импорт main: {best:.1f} мс (бюджет {STARTUP_IMPORT_BUDGET_MS} мс)")
+        if best > STARTUP_IMPORT_BUDGET_MS:
+            failures.append(f"импорт main занимает {best:.1f} мс")
+    return failures
+
+
+def seed_profile(db, transactions):
+    """Создаёт профиль с базовыми категориями и случайными операциями за три года."""
+    db.create_profile("perf", "perf")
+    with db.connection() as conn:
+        profile_id = conn.execute("SELECT id FROM profiles WHERE login = 'perf'").fetchone()[0]
+        categories = conn.execute("SELECT id, type FROM categories WHERE profile_id = ?", (profile_id,)).fetchall()
+        first = date.today() - timedelta(days=3 * 365)
+        rows = []
+        for _ in range(transactions):
+            category_id, type_ = random.choice(categories)
+            day = first + timedelta(days=random.randrange(3 * 365))
+            rows.append((profile_id, day.isoformat(), day.toordinal(), category_id, type_,
+                         random.randint(100, 1000000), "perf"))
+        conn.executemany(
+            "INSERT INTO transactions (profile_id, date, day, category_id, type, amount, description) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        conn.commit()
+    return profile_id, categories
+
+
+def measure_ui(transactions=20000):
+    """
+    Замеры интерфейса на временной базе (без окна на экране): (время в мс по шагам,
+    счётчики кэша сводок статистики ResultCache.info()).
+    """
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from main_window import MainWindow, TAB_NAMES
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "finance.db"), backup_dir=os.path.join(tmp, "backups"))
+        try:
+            profile_id, categories = seed_profile(db, transactions)
+            repository = TransactionRepository(db)
+
+            def edit():
+                category_id, type_ = random.choice(categories)
+                started = time.perf_counter()
+                window.data_updated.emit(repository.insert(
+                    profile_id, date.today().isoformat(), category_id, type_, 12345, "perf"))
+                return (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            window = MainWindow(db, profile_id, "perf")
+            app.processEvents()
+            timings["главное окно"] = (time.perf_counter() - started) * 1000
+            for index, name in enumerate(TAB_NAMES[1:], 1):
+                started = time.perf_counter()
+                window.tabs.setCurrentIndex(index)
+                app.processEvents()
+                timings[f"первое открытие {name}"] = (time.perf_counter() - started) * 1000
+            window.tabs.setCurrentIndex(0)
+            timings["изменение, статистика и бюджет скрыты"] = edit()
+            started = time.perf_counter()
+            window.tabs.setCurrentIndex(TAB_NAMES.index("statistics"))
+            app.processEvents()
+            timings["показ устаревшей статистики"] = (time.perf_counter() - started) * 1000
+            timings["изменение на открытой статистике"] = edit()
+            cache_info = window.statistics_tab.stats.cache.info()
+            window.close()
+        finally:
+            db.close()
+    return timings, cache_info
+
+
+def measure_backup(transactions=200000):
+    """
+    Фоновый снимок через Database.backup_from в отдельном потоке, пока основной
+    поток выполняет запросы: {режим: (время снимка, худшая задержка запроса) в мс}.
+    """
+    import sqlite3
+    import threading
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "finance.db"), backup_dir=os.path.join(tmp, "backups"))
+        try:
+            seed_profile(db, transactions)
+            # Первый снимок записывает все блоки; замеряются повторные, как в работе приложения
+            db.backup_db()
+
+            def query():
+                started = time.perf_counter()
+                with db.connection() as conn:
+                    conn.execute("SELECT COUNT(*), SUM(amount) FROM transactions WHERE profile_id = 1 AND day = ?",
+                                 (random.randint(738000, 739000),)).fetchone()
+                return (time.perf_counter() - started) * 1000
+
+            results["без копирования"] = (0, max(query() for _ in range(1000)))
+            for name, pause in (("без пауз", 0), ("с паузами", Database.BACKUP_STEP_PAUSE)):
+                reader = sqlite3.connect(db.db_path, check_same_thread=False)
+                done = {}
+
+                def run():
+                    started = time.perf_counter()
+                    db.backup_from(reader, pause=pause)
+                    done["ms"] = (time.perf_counter() - started) * 1000
+
+                thread = threading.Thread(target=run)
+                thread.start()
+                latencies = [query()]
+                while thread.is_alive():
+                    latencies.append(query())
+                thread.join()
+                reader.close()
+                results[name] = (done["ms"], max(latencies))
+        finally:
+            db.close()
+    return results
+
+
+if __name__ == "__main__":
+    failures = check_query_plans()
+    for name, scans in failures.items():
+        print(f"FAIL {name}: {'; '.join(scans)}")
+    if failures:
+        sys.exit(1)
+    print(f"OK: {len(PRODUCTION_QUERIES)} запросов используют индексы")
+    startup_failures = check_startup_imports()
+    for failure in startup_failures:
+        print(f"FAIL startup: {failure}")
+    if startup_failures:
+        sys.exit(1)
+    if "--ui" in sys.argv:
+        timings, cache_info = measure_ui()
+        for name, ms in timings.items():
+            print(f"{name}: {ms:.1f} мс")
+        print(f"Кэш сводок статистики: {cache_info}")
+    if "--backup" in sys.argv:
+        for name, (backup_ms, query_ms) in measure_backup().items():
+            print(f"Резервная копия {name}: {backup_ms:.0f} мс, худший запрос {query_ms:.1f} мс")
+    if "--bcrypt" in sys.argv:
+        for rounds, ms in passwords.benchmark().items():
+            mark = " (текущая)" if rounds == passwords.DEFAULT_ROUNDS else ""
+            print(f"bcrypt, стоимость {rounds}{mark}: проверка пароля {ms:.1f} мс")
@@ -0,0 +1,119 @@
+# periods.py
+"""
+Периоды фильтров вкладок.
+
+Каждый период сводится к полуоткрытому диапазону номеров дней
+[start_day, end_day), который проверяется условиями day >= ? AND day < ?
+и поэтому всегда использует индексы по (profile_id, day). None на месте
+границы означает, что с этой стороны период не ограничен.
+Вычисление границ кэшируется: за день набор периодов не меняется.
+"""
+from datetime import date, timedelta
+from functools import lru_cache
+import calendar
+from units import date_bounds, day_number, month_bounds, week_bounds, year_bounds
+
+# Виды периодов
+ALL = "all"
+CURRENT_WEEK = "current_week"
+CURRENT_MONTH = "current_month"
+PREVIOUS_MONTH = "previous_month"
+CURRENT_YEAR = "current_year"
+LAST_WEEK = "last_week"  # последние 7 дней и позже
+LAST_MONTH = "last_month"  # с той же даты месяц назад и позже
+LAST_YEAR = "last_year"  # с той же даты год назад и позже
+CUSTOM = "custom"
+
+# Подписи периодов во вкладках -> вид периода
+TRANSACTION_PERIODS = {
+    "Все": ALL,
+    "Месяц": LAST_MONTH,
+    "Неделя": LAST_WEEK,
+    "Год": LAST_YEAR,
+    "Произвольный": CUSTOM,
+}
+STATISTICS_PERIODS = {
+    "Текущий месяц": CURRENT_MONTH,
+    "Прошлый месяц": PREVIOUS_MONTH,
+    "Год": CURRENT_YEAR,
+    "Произвольный": CUSTOM,
+}
+LIMIT_PERIODS = {
+    "Неделя": CURRENT_WEEK,
+    "Месяц": CURRENT_MONTH,
+    "Год": CURRENT_YEAR,
+}
+
+
+def add_months(value, months):
+    """Сдвигает дату на months месяцев; день ограничивается длиной месяца (31.03 -> 28.02)."""
+    month_index = value.year * 12 + value.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    return date(year, month, min(value.day, calendar.monthrange(year, month)[1]))
+
+
+@lru_cache(maxsize=256)
+def period_bounds(kind, today, date_from=None, date_to=None):
+    """Диапазон [start_day, end_day) периода вида kind относительно даты today."""
+    if kind == ALL:
+        return None, None
+    if kind == CURRENT_WEEK:
+        return week_bounds(today)
+    if kind == CURRENT_MONTH:
+        return month_bounds(today.year, today.month)
+    if kind == PREVIOUS_MONTH:
+        previous = add_months(today.replace(day=1), -1)
+        return month_bounds(previous.year, previous.month)
+    if kind == CURRENT_YEAR:
+        return year_bounds(today.year)
+    if kind == LAST_WEEK:
+        return day_number(today - timedelta(days=7)), None
+    if kind == LAST_MONTH:
+        return day_number(add_months(today, -1)), None
+    if kind == LAST_YEAR:
+        return day_number(add_months(today, -12)), None
+    if kind == CUSTOM:
+        if date_from is None or date_to is None:
+            raise ValueError("Для произвольного периода нужны обе даты")
+        return date_bounds(date_from, date_to)
+    raise ValueError(f"Неизвестный период: {kind}")
+
+
+def day_range_predicate(column, start_day, end_day):
+    """Условие SQL и параметры для диапазона [start_day, end_day); None-границы пропускаются."""
+    conditions = []
+    params = []
+    if start_day is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(start_day)
+    if end_day is not None:
+        conditions.append(f"{column} < ?")
+        params.append(end_day)
+    return " AND ".join(conditions), params
+
+
+class PeriodFilter:
+    """Период фильтра: вид периода и, для произвольного периода, включительные даты."""
+
+    def __init__(self, kind, date_from=None, date_to=None):
+        self.kind = kind
+        self.date_from = date_from if kind == CUSTOM else None
+        self.date_to = date_to if kind == CUSTOM else None
+
+    @classmethod
+    def from_label(cls, label, labels, date_from=None, date_to=None):
+        """Период по подписи из выпадающего списка вкладки (labels — TRANSACTION_PERIODS и т. п.)."""
+        if label not in labels:
+            raise ValueError(f"Неизвестный период: {label}")
+        return cls(labels[label], date_from, date_to)
+
+    def bounds(self, today=None):
+        return period_bounds(self.kind, today or date.today(), self.date_from, self.date_to)
+
+    def predicate(self, column="day", today=None):
+        """Условие SQL вида "day >= ? AND day < ?" с параметрами."""
+        return day_range_predicate(column, *self.bounds(today))
+
+    def __repr__(self):
+        return f"PeriodFilter({self.kind}, {self.date_from}, {self.date_to})"
@@ -0,0 +1,406 @@
+# repository.py
+"""
+Доступ к данным без зависимостей от Qt.
+
+Репозитории инкапсулируют SQL вкладок и возвращают обычные кортежи Python,
+поэтому их можно использовать из скриптов, профилировать и кэшировать
+без запуска графического интерфейса. Суммы — в копейках, даты — номера дней.
+"""
+import weakref
+from units import day_number
+from periods import day_range_predicate
+
+
+class CategoryRepository:
+    def __init__(self, db):
+        self.db = db
+
+    def list(self, profile_id, type_=None):
+        """Категории профиля: [(id, name, type)]; type_ ограничивает выборку доходами или расходами."""
+        query = "SELECT id, name, type FROM categories WHERE profile_id = ?"
+        params = [profile_id]
+        if type_:
+            query += " AND type = ?"
+            params.append(type_)
+        with self.db.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def get(self, profile_id, category_id):
+        """Возвращает (name, type) или None."""
+        with self.db.connection() as conn:
+            return conn.execute(
+                "SELECT name, type FROM categories WHERE id = ? AND profile_id = ?",
+                (category_id, profile_id)
+            ).fetchone()
+
+    def insert(self, profile_id, name, type_):
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO categories (profile_id, name, type) VALUES (?, ?, ?)",
+                (profile_id, name, type_)
+            )
+            self.db.bump_data_version(profile_id)
+            return cursor.lastrowid
+
+    def update(self, profile_id, category_id, name, type_):
+        with self.db.connection() as conn:
+            conn.execute(
+                "UPDATE categories SET name = ?, type = ? WHERE id = ? AND profile_id = ?",
+                (name, type_, category_id, profile_id)
+            )
+            self.db.bump_data_version(profile_id)
+
+    def delete(self, profile_id, category_id):
+        with self.db.connection() as conn:
+            conn.execute("DELETE FROM categories WHERE id = ? AND profile_id = ?", (category_id, profile_id))
+            self.db.bump_data_version(profile_id)
+
+    def is_used(self, profile_id, category_id):
+        """Есть ли операции в категории."""
+        with self.db.connection() as conn:
+            return conn.execute(
+                "SELECT 1 FROM transactions WHERE profile_id = ? AND category_id = ? LIMIT 1",
+                (profile_id, category_id)
+            ).fetchone() is not None
+
+
+class CategoryCache:
+    """
+    Категории одного профиля в памяти: загружаются одним запросом и
+    обновляются на месте при изменениях через этот же объект, поэтому
+    списки в фильтрах и диалогах строятся без обращения к базе.
+    Подписчики (add_listener) вызываются после каждого изменения.
+    """
+
+    def __init__(self, db, profile_id):
+        self.repository = CategoryRepository(db)
+        self.profile_id = profile_id
+        self._listeners = []
+        self.reload(notify=False)
+
+    def reload(self, notify=True):
+        """Перечитывает категории из базы (например, после восстановления копии)."""
+        self.by_id = {id_: (id_, name, type_) for id_, name, type_ in self.repository.list(self.profile_id)}
+        self.by_name = {name: id_ for id_, name, _ in self.by_id.values()}
+        if notify:
+            self._notify()
+
+    def add_listener(self, callback):
+        """Подписывает callback() на изменения; для методов объектов хранится слабая ссылка."""
+        self._listeners.append(weakref.WeakMethod(callback) if hasattr(callback, "__self__") else lambda: callback)
+
+    def clear_listeners(self):
+        """Отписывает всех подписчиков (вкладки закрытого главного окна)."""
+        self._listeners = []
+
+    def _notify(self):
+        alive = []
+        for ref in self._listeners:
+            callback = ref()
+            if callback is not None:
+                alive.append(ref)
+                callback()
+        self._listeners = alive
+
+    def list(self, type_=None):
+        """Категории в формате CategoryRepository.list: [(id, name, type)]."""
+        return [row for row in self.by_id.values() if type_ is None or row[2] == type_]
+
+    def get(self, category_id):
+        """Возвращает (name, type) или None."""
+        row = self.by_id.get(category_id)
+        return row[1:] if row else None
+
+    def id_by_name(self, name):
+        return self.by_name.get(name)
+
+    def insert(self, name, type_):
+        category_id = self.repository.insert(self.profile_id, name, type_)
+        self.by_id[category_id] = (category_id, name, type_)
+        self.by_name[name] = category_id
+        self._notify()
+        return category_id
+
+    def update(self, category_id, name, type_):
+        self.repository.update(self.profile_id, category_id, name, type_)
+        old = self.by_id.get(category_id)
+        if old:
+            self.by_name.pop(old[1], None)
+        self.by_id[category_id] = (category_id, name, type_)
+        self.by_name[name] = category_id
+        self._notify()
+
+    def delete(self, category_id):
+        self.repository.delete(self.profile_id, category_id)
+        old = self.by_id.pop(category_id, None)
+        if old:
+            self.by_name.pop(old[1], None)
+        self._notify()
+
+    def is_used(self, category_id):
+        return self.repository.is_used(self.profile_id, category_id)
+
+
+# category_id операций без категории в TransactionChange (как COALESCE(category_id, 0) в daily_totals)
+UNCATEGORIZED_ID = 0
+
+
+class TransactionChange:
+    """
+    Изменение одной операции, которое передаётся вкладкам вместо полной перезагрузки.
+    old и new — строки в формате TransactionRepository.list:
+    (id, day, category_id, category_name, type, amount, description);
+    old равен None для вставки, new — для удаления.
+    """
+    INSERTED = "inserted"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+    def __init__(self, kind, old=None, new=None):
+        self.kind = kind
+        self.old = old
+        self.new = new
+
+    @property
+    def transaction_id(self):
+        return (self.new or self.old)[0]
+
+    def deltas(self):
+        """Пары (знак, строка): старая строка вычитается из сумм, новая прибавляется."""
+        if self.old is not None:
+            yield -1, self.old
+        if self.new is not None:
+            yield 1, self.new
+
+    def __repr__(self):
+        return f"TransactionChange({self.kind}, old={self.old}, new={self.new})"
+
+
+class TransactionRepository:
+    # Ключи сортировки списка операций: выражение SQL и номер столбца в строке результата
+    SORT_COLUMNS = {
+        "date": ("t.day", 1),
+        "category": ("c.name", 3),
+        "type": ("t.type", 4),
+        "amount": ("t.amount", 5),
+        "description": ("COALESCE(t.description, '')", 6),
+        # Релевантность полнотекстового поиска; выбирается, если при поиске сортировка не задана
+        "rank": ("f.rank", 7),
+    }
+    # Размер страницы при постраничной загрузке списка
+    PAGE_SIZE = 200
+
+    def __init__(self, db, fulltext=None):
+        self.db = db
+        # Поиск через индекс FTS5, если он есть в базе; иначе LIKE по описанию
+        self.fulltext = getattr(db, "fulltext", False) if fulltext is None else fulltext
+
+    @staticmethod
+    def match_expression(search):
+        """
+        Выражение FTS5 MATCH для строки поиска: каждое слово ищется по префиксу,
+        все слова должны встретиться в описании или названии категории.
+        """
+        words = search.split()
+        return " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+    def effective_sort(self, sort=None, search=None):
+        """Ключ сортировки, который фактически применяется к запросу."""
+        if sort in self.SORT_COLUMNS and sort != "rank":
+            return sort
+        if search and search.strip() and self.fulltext:
+            return "rank"
+        return "date"
+
+    def build_list_query(self, profile_id, type_=None, category_id=None, search=None,
+                         start_day=None, end_day=None, sort=None, descending=False,
+                         after=None, limit=None):
+        """
+        Строит запрос списка операций. start_day/end_day задают полуоткрытый
+        диапазон [start_day, end_day); None означает отсутствие границы.
+        Строки упорядочены по (ключ сортировки, id); after — пара
+        (значение ключа, id) последней полученной строки для перехода
+        к следующей странице без OFFSET.
+        """
+        search = search.strip() if search else None
+        sort = self.effective_sort(sort, search)
+        key = self.SORT_COLUMNS[sort][0]
+        fulltext = bool(search) and self.fulltext
+        query = """
+            SELECT t.id, t.day, t.category_id, c.name, t.type, t.amount, COALESCE(t.description, '')
+        """
+        if fulltext:
+            # Найденные индексом FTS5 строки соединяются с операциями по rowid
+            query += """, f.rank
+            FROM transactions_fts f
+            JOIN transactions t ON t.id = f.rowid
+            JOIN categories c ON t.category_id = c.id
+            WHERE f.transactions_fts MATCH ? AND t.profile_id = ?
+            """
+            params = [self.match_expression(search), profile_id]
+        else:
+            query += """
+            FROM transactions t
+            JOIN categories c ON t.category_id = c.id
+            WHERE t.profile_id = ?
+            """
+            params = [profile_id]
+        if type_:
+            query += " AND t.type = ?"
+            params.append(type_)
+        if category_id is not None:
+            query += " AND t.category_id = ?"
+            params.append(category_id)
+        if search and not fulltext:
+            query += " AND t.description LIKE ?"
+            params.append(f"%{search}%")
+        period, period_params = day_range_predicate("t.day", start_day, end_day)
+        if period:
+            query += f" AND {period}"
+            params.extend(period_params)
+        if after is not None:
+            query += f" AND ({key}, t.id) {'<' if descending else '>'} (?, ?)"
+            params.extend(after)
+        direction = "DESC" if descending else "ASC"
+        query += f" ORDER BY {key} {direction}, t.id {direction}"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return query, params
+
+    def list(self, profile_id, **filters):
+        """
+        Операции профиля: [(id, day, category_id, category_name, type, amount, description)].
+        При полнотекстовом поиске в конец строки добавляется релевантность (rank).
+        """
+        query, params = self.build_list_query(profile_id, **filters)
+        with self.db.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def page(self, profile_id, after=None, limit=None, **filters):
+        """
+        Следующая страница списка после строки с ключом after (None — первая страница).
+        Возвращает строки в формате list() и ключ последней строки для следующего вызова.
+        """
+        rows = self.list(profile_id, after=after, limit=limit or self.PAGE_SIZE, **filters)
+        sort = self.effective_sort(filters.get("sort"), filters.get("search"))
+        return rows, self.page_key(rows[-1], sort) if rows else after
+
+    @classmethod
+    def page_key(cls, row, sort=None):
+        """Ключ (значение столбца сортировки, id) строки результата."""
+        column = cls.SORT_COLUMNS.get(sort, cls.SORT_COLUMNS["date"])[1]
+        return row[column], row[0]
+
+    def get(self, profile_id, transaction_id):
+        """Возвращает (date, category_id, type, amount, description) или None."""
+        with self.db.connection() as conn:
+            return conn.execute(
+                "SELECT date, category_id, type, amount, description "
+                "FROM transactions WHERE id = ? AND profile_id = ?",
+                (transaction_id, profile_id)
+            ).fetchone()
+
+    def row(self, profile_id, transaction_id):
+        """
+        Одна операция в формате list() или None. В отличие от списка, строка
+        находится и без категории: category_id такой операции равен
+        UNCATEGORIZED_ID, а название — пустой строке, чтобы изменение не терялось.
+        """
+        with self.db.connection() as conn:
+            return conn.execute("""
+                SELECT t.id, t.day, COALESCE(t.category_id, ?), COALESCE(c.name, ''),
+                       t.type, t.amount, COALESCE(t.description, '')
+                FROM transactions t
+                LEFT JOIN categories c ON t.category_id = c.id
+                WHERE t.profile_id = ? AND t.id = ?
+            """, (UNCATEGORIZED_ID, profile_id, transaction_id)).fetchone()
+
+    def insert(self, profile_id, date, category_id, type_, amount, description):
+        """Добавляет операцию и возвращает TransactionChange."""
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO transactions (profile_id, date, day, category_id, type, amount, description) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (profile_id, date, day_number(date), category_id, type_, amount, description)
+            )
+            self.db.bump_data_version(profile_id)
+            return TransactionChange(TransactionChange.INSERTED, new=self.row(profile_id, cursor.lastrowid))
+
+    def update(self, profile_id, transaction_id, date, category_id, type_, amount, description):
+        """Изменяет операцию и возвращает TransactionChange со старой и новой строкой."""
+        with self.db.connection() as conn:
+            old = self.row(profile_id, transaction_id)
+            conn.execute(
+                "UPDATE transactions SET date = ?, day = ?, category_id = ?, type = ?, amount = ?, "
+                "description = ? WHERE id = ? AND profile_id = ?",
+                (date, day_number(date), category_id, type_, amount, description, transaction_id, profile_id)
+            )
+            self.db.bump_data_version(profile_id)
+            return TransactionChange(TransactionChange.UPDATED, old=old, new=self.row(profile_id, transaction_id))
+
+    def delete(self, profile_id, transaction_id):
+        """Удаляет операцию и возвращает TransactionChange с удалённой строкой."""
+        with self.db.connection() as conn:
+            old = self.row(profile_id, transaction_id)
+            conn.execute("DELETE FROM transactions WHERE id = ? AND profile_id = ?", (transaction_id, profile_id))
+            self.db.bump_data_version(profile_id)
+            return TransactionChange(TransactionChange.DELETED, old=old)
+
+
+class LimitRepository:
+    def __init__(self, db):
+        self.db = db
+
+    def list(self, profile_id, category_id=None):
+        """Лимиты профиля: [(id, category_id, category_name, amount, period)]."""
+        query = """
+            SELECT l.id, l.category_id, c.name, l.amount, l.period
+            FROM limits l
+            JOIN categories c ON l.category_id = c.id
+            WHERE l.profile_id = ?
+        """
+        params = [profile_id]
+        if category_id is not None:
+            query += " AND l.category_id = ?"
+            params.append(category_id)
+        with self.db.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def get(self, profile_id, limit_id):
+        """Возвращает (category_id, amount, period) или None."""
+        with self.db.connection() as conn:
+            return conn.execute(
+                "SELECT category_id, amount, period FROM limits WHERE id = ? AND profile_id = ?",
+                (limit_id, profile_id)
+            ).fetchone()
+
+    def exists(self, profile_id, category_id, period, exclude_id=None):
+        """Есть ли другой лимит для той же категории и периода."""
+        with self.db.connection() as conn:
+            return conn.execute(
+                "SELECT id FROM limits WHERE profile_id = ? AND category_id = ? AND period = ? AND id != ?",
+                (profile_id, category_id, period, exclude_id or 0)
+            ).fetchone() is not None
+
+    def insert(self, profile_id, category_id, amount, period):
+        with self.db.connection() as conn:
+            cursor = conn.execute(
+                "INSERT INTO limits (profile_id, category_id, amount, period) VALUES (?, ?, ?, ?)",
+                (profile_id, category_id, amount, period)
+            )
+            self.db.note_write()
+            return cursor.lastrowid
+
+    def update(self, profile_id, limit_id, category_id, amount, period):
+        with self.db.connection() as conn:
+            conn.execute(
+                "UPDATE limits SET category_id = ?, amount = ?, period = ? WHERE id = ? AND profile_id = ?",
+                (category_id, amount, period, limit_id, profile_id)
+            )
+            self.db.note_write()
+
+    def delete(self, profile_id, limit_id):
+        with self.db.connection() as conn:
+            conn.execute("DELETE FROM limits WHERE id = ? AND profile_id = ?", (limit_id, profile_id))
+            self.db.note_write()
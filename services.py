@@ -0,0 +1,485 @@
+# services.py
+"""
+Сервисы отчётов без зависимостей от Qt.
+
+Результаты возвращаются в виде словарей столбцов (списков одинаковой длины),
+которые удобно передавать в диаграммы, экспорт или скрипты на сервере.
+Суммы — в копейках, даты — номера дней; start_day/end_day задают
+полуоткрытый диапазон [start_day, end_day).
+"""
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import date
+from functools import partial
+from periods import PeriodFilter, LIMIT_PERIODS, day_range_predicate
+from units import day_to_date, JULIAN_DAY_OFFSET
+from repository import UNCATEGORIZED_ID
+import analytics
+
+# Фильтр типа данных статистики -> значение столбца transactions.type
+TYPE_FILTERS = {
+    "Доходы": "Доход",
+    "Расходы": "Расход",
+}
+
+# Интервалы группировки гистограммы от мелкого к крупному
+BUCKET_UNITS = ("day", "week", "month", "quarter", "year")
+# Наибольшее число столбцов гистограммы, при котором QtCharts рисует её без задержек
+MAX_BARS = 60
+# Номер месяца (год * 12 + месяц - 1) для дня d.day; кварталы и годы получаются делением
+_MONTH_SQL = (f"(CAST(strftime('%Y', d.day + {JULIAN_DAY_OFFSET}) AS INTEGER) * 12"
+              f" + CAST(strftime('%m', d.day + {JULIAN_DAY_OFFSET}) AS INTEGER) - 1)")
+# Номер интервала группировки в SQL, совпадающий с bucket_index
+BUCKET_SQL = {
+    "day": "d.day",
+    "week": "(d.day - 1) / 7",
+    "month": _MONTH_SQL,
+    "quarter": f"{_MONTH_SQL} / 3",
+    "year": f"{_MONTH_SQL} / 12",
+}
+
+
+class ResultCache:
+    """
+    LRU-кэш результатов отчётов. Каждая запись хранит версию данных, при
+    которой она вычислена; запись с другой версией считается устаревшей.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version, default=None):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        return default
+
+    def put(self, key, version, value):
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+
+class StatsService:
+    """
+    Сводки строятся по таблице дневных итогов daily_totals, которую
+    поддерживают триггеры; export_rows читает сами операции.
+    Результаты кэшируются по (вид, профиль, период, фильтр типа) и
+    пересчитываются только после изменения версии данных профиля.
+    Если установлен NumPy, сводки считаются столбцовым движком
+    analytics.ProfileAnalytics вместо запросов к daily_totals.
+    """
+
+    def __init__(self, db, cache_size=64, use_analytics=True):
+        self.db = db
+        self.cache = ResultCache(cache_size)
+        self.use_analytics = use_analytics and analytics.available()
+        self._analytics = {}
+
+    def engine(self, profile_id):
+        """Движок аналитики профиля или None, если NumPy недоступен."""
+        if not self.use_analytics:
+            return None
+        engine = self._analytics.get(profile_id)
+        if engine is None:
+            engine = self._analytics[profile_id] = analytics.ProfileAnalytics(self.db, profile_id)
+        return engine
+
+    def apply_change(self, profile_id, change):
+        """Передаёт изменение операции движку аналитики, чтобы не перечитывать все операции."""
+        engine = self._analytics.get(profile_id)
+        if engine is not None:
+            engine.apply_change(change)
+
+    def _cached(self, kind, compute, profile_id, start_day, end_day, type_filter=None):
+        key = (profile_id, start_day, end_day, type_filter, kind)
+        version = self.db.data_version(profile_id)
+        result = self.cache.get(key, version)
+        if result is None:
+            result = compute(profile_id, start_day, end_day, type_filter)
+            self.cache.put(key, version, result)
+        # Вызывающий код может менять списки результата (adjust_*), кэш должен остаться нетронутым
+        return {name: list(column) for name, column in result.items()} if isinstance(result, dict) else result
+
+    def totals(self, profile_id, start_day, end_day):
+        """Возвращает (доходы, расходы) за период."""
+        return self._cached("totals", self._totals, profile_id, start_day, end_day)
+
+    def by_category(self, profile_id, start_day, end_day, type_filter=None):
+        """Суммы по категориям: {"names": [...], "amounts": [...]}."""
+        return self._cached("by_category", self._by_category, profile_id, start_day, end_day, type_filter)
+
+    def daily(self, profile_id, start_day, end_day):
+        """Доходы и расходы по дням: {"days": [...], "income": [...], "expense": [...]}."""
+        return self._cached("daily", self._daily, profile_id, start_day, end_day)
+
+    def buckets(self, profile_id, start_day, end_day, unit):
+        """
+        Доходы и расходы по интервалам unit из BUCKET_UNITS: {"starts": [...], "income": [...],
+        "expense": [...]}, где starts — первые дни интервалов, в которых есть операции.
+        """
+        return self._cached(f"buckets_{unit}", partial(self._buckets, unit), profile_id, start_day, end_day)
+
+    def _totals(self, profile_id, start_day, end_day, type_filter=None):
+        engine = self.engine(profile_id)
+        if engine is not None:
+            return engine.totals(start_day, end_day)
+        query, params = self.totals_query(profile_id, start_day, end_day)
+        with self.db.connection() as conn:
+            income, expense = conn.execute(query, params).fetchone()
+        return income or 0, expense or 0
+
+    def _by_category(self, profile_id, start_day, end_day, type_filter=None):
+        engine = self.engine(profile_id)
+        if engine is not None:
+            return engine.by_category(start_day, end_day, TYPE_FILTERS.get(type_filter))
+        query, params = self.by_category_query(profile_id, start_day, end_day, type_filter)
+        with self.db.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return {
+            "names": [row[0] for row in rows],
+            "amounts": [row[1] for row in rows],
+        }
+
+    def _daily(self, profile_id, start_day, end_day, type_filter=None):
+        engine = self.engine(profile_id)
+        if engine is not None:
+            return engine.daily(start_day, end_day)
+        query, params = self.daily_query(profile_id, start_day, end_day)
+        with self.db.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return {
+            "days": [row[0] for row in rows],
+            "income": [row[1] for row in rows],
+            "expense": [row[2] for row in rows],
+        }
+
+    def _buckets(self, unit, profile_id, start_day, end_day, type_filter=None):
+        engine = self.engine(profile_id)
+        if engine is not None:
+            sums = engine.buckets(start_day, end_day, unit)
+            rows = zip(sums["buckets"], sums["income"], sums["expense"])
+        else:
+            query, params = self.buckets_query(profile_id, start_day, end_day, unit)
+            with self.db.connection() as conn:
+                rows = conn.execute(query, params).fetchall()
+        result = {"starts": [], "income": [], "expense": []}
+        for index, income, expense in rows:
+            result["starts"].append(bucket_start(index, unit))
+            result["income"].append(income)
+            result["expense"].append(expense)
+        return result
+
+    @staticmethod
+    def totals_query(profile_id, start_day, end_day):
+        """Запрос сводки (доходы, расходы) по daily_totals."""
+        query = """
+            SELECT SUM(CASE WHEN type = 'Доход' THEN amount ELSE 0 END),
+                   SUM(CASE WHEN type = 'Расход' THEN amount ELSE 0 END)
+            FROM daily_totals
+            WHERE profile_id = ? AND day >= ? AND day < ?
+        """
+        return query, [profile_id, start_day, end_day]
+
+    @staticmethod
+    def by_category_query(profile_id, start_day, end_day, type_filter=None):
+        """Запрос сумм по категориям: (name, amount)."""
+        query = """
+            SELECT c.name, SUM(d.amount)
+            FROM daily_totals d JOIN categories c ON d.category_id = c.id
+            WHERE d.profile_id = ? AND d.day >= ? AND d.day < ?
+        """
+        params = [profile_id, start_day, end_day]
+        if type_filter in TYPE_FILTERS:
+            query += " AND d.type = ?"
+            params.append(TYPE_FILTERS[type_filter])
+        query += " GROUP BY c.id"
+        return query, params
+
+    @staticmethod
+    def daily_query(profile_id, start_day, end_day):
+        """Запрос доходов и расходов по дням: (day, income, expense)."""
+        query = """
+            SELECT day,
+                   SUM(CASE WHEN type = 'Доход' THEN amount ELSE 0 END),
+                   SUM(CASE WHEN type = 'Расход' THEN amount ELSE 0 END)
+            FROM daily_totals
+            WHERE profile_id = ? AND day >= ? AND day < ?
+            GROUP BY day ORDER BY day
+        """
+        return query, [profile_id, start_day, end_day]
+
+    @staticmethod
+    def buckets_query(profile_id, start_day, end_day, unit):
+        """Запрос доходов и расходов по интервалам unit: (номер интервала, income, expense)."""
+        if unit not in BUCKET_SQL:
+            raise ValueError(f"Неизвестный интервал группировки: {unit}")
+        query = f"""
+            SELECT {BUCKET_SQL[unit]} AS bucket,
+                   SUM(CASE WHEN d.type = 'Доход' THEN d.amount ELSE 0 END),
+                   SUM(CASE WHEN d.type = 'Расход' THEN d.amount ELSE 0 END)
+            FROM daily_totals d
+            WHERE d.profile_id = ? AND d.day >= ? AND d.day < ?
+            GROUP BY bucket ORDER BY bucket
+        """
+        return query, [profile_id, start_day, end_day]
+
+    @staticmethod
+    def export_query(profile_id, start_day, end_day, type_filter=None):
+        """
+        Запрос строк экспорта: (date, category, type, amount_rubles, description).
+        Границы периода могут быть None — тогда период с этой стороны не ограничен.
+        """
+        query = """
+            SELECT t.date, c.name, t.type, t.amount / 100.0, t.description
+            FROM transactions t JOIN categories c ON t.category_id = c.id
+            WHERE t.profile_id = ?
+        """
+        params = [profile_id]
+        condition, day_params = day_range_predicate("t.day", start_day, end_day)
+        if condition:
+            query += f" AND {condition}"
+            params += day_params
+        if type_filter in TYPE_FILTERS:
+            query += " AND t.type = ?"
+            params.append(TYPE_FILTERS[type_filter])
+        query += " ORDER BY t.day, t.id"
+        return query, params
+
+    def export_rows(self, profile_id, start_day, end_day, type_filter=None):
+        """Строки для экспорта: [(date, category, type, amount_rubles, description)]."""
+        query, params = self.export_query(profile_id, start_day, end_day, type_filter)
+        with self.db.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+
+class LimitStatus:
+    """Состояние одного лимита за его текущий период. Суммы — в копейках."""
+
+    def __init__(self, limit_id, category_id, category, amount, period, start_day, end_day, spent):
+        self.limit_id = limit_id
+        self.category_id = category_id
+        self.category = category
+        self.amount = amount
+        self.period = period
+        self.start_day = start_day
+        self.end_day = end_day
+        self.spent = spent
+
+    @property
+    def remaining(self):
+        return self.amount - self.spent
+
+    @property
+    def used_percentage(self):
+        return (self.spent / self.amount * 100) if self.amount > 0 else 0
+
+    def covers(self, category_id, day):
+        """Учитывается ли расход категории за этот день в лимите."""
+        return category_id == self.category_id and self.start_day <= day < self.end_day
+
+    def __repr__(self):
+        return f"LimitStatus({self.category!r}, {self.period}, spent={self.spent}, amount={self.amount})"
+
+
+class BudgetService:
+    """
+    Расчёт остатков по всем лимитам профиля одним запросом: расходы за
+    неделю, месяц и год считаются за один проход по дневным итогам, поэтому
+    число запросов не зависит от количества лимитов.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def build_query(self, profile_id, today=None, category_id=None):
+        bounds = {period: PeriodFilter(kind).bounds(today) for period, kind in LIMIT_PERIODS.items()}
+        query = f"""
+            WITH periods(period, start_day, end_day) AS (
+                VALUES {", ".join("(?, ?, ?)" for _ in LIMIT_PERIODS)}
+            ),
+            spent(category_id, period, amount) AS (
+                SELECT d.category_id, p.period, SUM(d.amount)
+                FROM daily_totals d
+                JOIN periods p ON d.day >= p.start_day AND d.day < p.end_day
+                WHERE d.profile_id = ? AND d.type = 'Расход' AND d.day >= ? AND d.day < ?
+                GROUP BY d.category_id, p.period
+            )
+            SELECT l.id, l.category_id, c.name, l.amount, l.period, p.start_day, p.end_day, COALESCE(s.amount, 0)
+            FROM limits l
+            JOIN categories c ON l.category_id = c.id
+            JOIN periods p ON p.period = l.period
+            LEFT JOIN spent s ON s.category_id = l.category_id AND s.period = l.period
+            WHERE l.profile_id = ?
+        """
+        params = [value for period in LIMIT_PERIODS for value in (period, *bounds[period])]
+        params += [
+            profile_id,
+            min(start for start, _ in bounds.values()),
+            max(end for _, end in bounds.values()),
+            profile_id,
+        ]
+        if category_id is not None:
+            query += " AND l.category_id = ?"
+            params.append(category_id)
+        query += " ORDER BY l.id"
+        return query, params
+
+    def evaluate(self, profile_id, today=None, category_id=None):
+        """Состояние всех лимитов профиля (или одной категории): [LimitStatus]."""
+        query, params = self.build_query(profile_id, today, category_id)
+        with self.db.connection() as conn:
+            return [LimitStatus(*row) for row in conn.execute(query, params)]
+
+    def exceeded(self, profile_id, today=None):
+        """Превышенные лимиты — для проверок по расписанию без интерфейса."""
+        return [status for status in self.evaluate(profile_id, today) if status.remaining <= 0]
+
+
+# Пересчёт результатов StatsService после изменения одной операции без повторного запроса
+
+
+def adjust_totals(totals, change, start_day, end_day):
+    """Возвращает (доходы, расходы) после изменения TransactionChange."""
+    income, expense = totals
+    for sign, (_, day, _, _, type_, amount, _) in change.deltas():
+        if start_day <= day < end_day:
+            if type_ == "Доход":
+                income += sign * amount
+            else:
+                expense += sign * amount
+    return income, expense
+
+
+def adjust_by_category(result, change, start_day, end_day, type_filter=None):
+    """Обновляет результат by_category на месте; категории без операций убираются."""
+    names, amounts = result["names"], result["amounts"]
+    for sign, (_, day, category_id, name, type_, amount, _) in change.deltas():
+        # Операции без категории не входят в сводку по категориям (JOIN categories)
+        if category_id == UNCATEGORIZED_ID or not start_day <= day < end_day:
+            continue
+        if type_filter in TYPE_FILTERS and type_ != TYPE_FILTERS[type_filter]:
+            continue
+        if name in names:
+            index = names.index(name)
+            amounts[index] += sign * amount
+            # Суммы операций положительны, поэтому ноль означает, что операций не осталось
+            if amounts[index] <= 0:
+                del names[index], amounts[index]
+        elif sign > 0:
+            names.append(name)
+            amounts.append(amount)
+    return result
+
+
+def _adjust_series(result, key, start_of, change, start_day, end_day):
+    """Обновляет доходы и расходы ряда на месте; result[key] — упорядоченные начала интервалов."""
+    starts = result[key]
+    for sign, (_, day, _, _, type_, amount, _) in change.deltas():
+        if not start_day <= day < end_day:
+            continue
+        start = start_of(day)
+        index = bisect_left(starts, start)
+        if index == len(starts) or starts[index] != start:
+            if sign < 0:
+                continue
+            starts.insert(index, start)
+            result["income"].insert(index, 0)
+            result["expense"].insert(index, 0)
+        column = result["income"] if type_ == "Доход" else result["expense"]
+        column[index] += sign * amount
+        if result["income"][index] <= 0 and result["expense"][index] <= 0:
+            del starts[index], result["income"][index], result["expense"][index]
+    return result
+
+
+def adjust_daily(result, change, start_day, end_day):
+    """Обновляет результат daily на месте, сохраняя порядок дней."""
+    return _adjust_series(result, "days", lambda day: day, change, start_day, end_day)
+
+
+def adjust_buckets(result, change, start_day, end_day, unit):
+    """Обновляет результат buckets на месте, сохраняя порядок интервалов."""
+    return _adjust_series(result, "starts", lambda day: bucket_start(bucket_index(day, unit), unit),
+                          change, start_day, end_day)
+
+
+# Группировка дневных итогов по неделям, месяцам, кварталам и годам
+
+
+def bucket_index(day, unit):
+    """Порядковый номер интервала unit, содержащего день (недели начинаются с понедельника)."""
+    if unit == "day":
+        return day
+    if unit == "week":
+        # День 1 (01.01.0001) — понедельник
+        return (day - 1) // 7
+    value = day_to_date(day)
+    if unit == "month":
+        return value.year * 12 + value.month - 1
+    if unit == "quarter":
+        return value.year * 4 + (value.month - 1) // 3
+    if unit == "year":
+        return value.year
+    raise ValueError(f"Неизвестный интервал группировки: {unit}")
+
+
+def bucket_start(index, unit):
+    """Номер первого дня интервала с порядковым номером index."""
+    if unit == "day":
+        return index
+    if unit == "week":
+        return index * 7 + 1
+    if unit == "month":
+        return date(index // 12, index % 12 + 1, 1).toordinal()
+    if unit == "quarter":
+        return date(index // 4, index % 4 * 3 + 1, 1).toordinal()
+    if unit == "year":
+        return date(index, 1, 1).toordinal()
+    raise ValueError(f"Неизвестный интервал группировки: {unit}")
+
+
+def choose_bucket(start_day, end_day, max_bars=MAX_BARS):
+    """
+    Самый мелкий интервал, при котором диапазон [start_day, end_day) даёт
+    не больше max_bars столбцов; для очень длинных диапазонов — годы.
+    """
+    for unit in BUCKET_UNITS:
+        if bucket_index(end_day - 1, unit) - bucket_index(start_day, unit) + 1 <= max_bars:
+            return unit
+    return BUCKET_UNITS[-1]
+
+
+def bucket_label(start_day, unit):
+    """Подпись столбца для интервала, начинающегося в день start_day."""
+    value = day_to_date(start_day)
+    if unit == "day":
+        return value.strftime("%d.%m")
+    if unit == "week":
+        return value.strftime("%d.%m.%y")
+    if unit == "month":
+        return value.strftime("%m.%Y")
+    if unit == "quarter":
+        return f"{(value.month - 1) // 3 + 1} кв. {value.year}"
+    return str(value.year)
@@ -1,19 +1,29 @@
 # settings.py
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QPushButton, QDialog, QFormLayout,
-    QLineEdit, QMessageBox, QHBoxLayout, QFileDialog
+    QLineEdit, QMessageBox, QHBoxLayout, QFileDialog, QProgressDialog, QApplication, QLabel, QInputDialog,
+    QProgressBar
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, pyqtSignal
 from PyQt5.QtGui import QFont
-import sqlite3
-import bcrypt
 import os
+from passwords import hash_password, verify_password
+from workers import TaskRunner
+
+# Пункт списка резервных копий для выбора файла полной копии
+FILE_BACKUP_ITEM = "Файл резервной копии…"
+
 
 class SettingsTab(QWidget):
+    database_restored = pyqtSignal()  # база заменена резервной копией, вкладкам нужно перечитать данные
+    restore_running = pyqtSignal(bool)  # на время восстановления таймеры вкладок и копий останавливаются
+
     def __init__(self, db, profile_id):
         super().__init__()
         self.db = db
         self.profile_id = profile_id
+        self.backup_scheduler = None
+        self._manual_backup = False
         self.init_ui()
 
     def init_ui(self):
@@ -55,24 +65,114 @@ class SettingsTab(QWidget):
         button_layout.addStretch()
 
         layout.addWidget(button_container)
+
+        # Ход фоновой резервной копии (ручной или автоматической)
+        progress_layout = QHBoxLayout()
+        self.backup_status = QLabel()
+        self.backup_progress = QProgressBar()
+        self.backup_progress.setFixedWidth(400)
+        self.backup_cancel_btn = QPushButton("Отменить")
+        self.backup_cancel_btn.clicked.connect(self.cancel_backup)
+        progress_layout.addStretch()
+        progress_layout.addWidget(self.backup_status)
+        progress_layout.addWidget(self.backup_progress)
+        progress_layout.addWidget(self.backup_cancel_btn)
+        progress_layout.addStretch()
+        layout.addLayout(progress_layout)
+        self.show_backup_running(False)
+
         layout.addStretch()
         self.setLayout(layout)
 
+    def set_backup_scheduler(self, scheduler):
+        """Резервные копии создаются в фоне планировщиком главного окна."""
+        self.backup_scheduler = scheduler
+        scheduler.started.connect(self.backup_started)
+        scheduler.progress.connect(self.show_backup_progress)
+        scheduler.finished.connect(self.backup_finished)
+        scheduler.failed.connect(self.backup_failed)
+        scheduler.cancelled.connect(self.backup_cancelled)
+        self.show_backup_running(scheduler.busy)
+
+    def show_backup_running(self, running):
+        self.backup_progress.setVisible(running)
+        self.backup_cancel_btn.setVisible(running)
+        if running:
+            self.backup_status.setText("Создание резервной копии…")
+            self.backup_progress.setValue(0)
+
+    def backup_started(self, note):
+        self.show_backup_running(True)
+        self.backup_status.setText(f"Создание резервной копии ({note})…")
+
+    def show_backup_progress(self, title, done, total):
+        self.backup_status.setText(f"{title}…")
+        self.backup_progress.setMaximum(max(total, 1))
+        self.backup_progress.setValue(done)
+
+    def cancel_backup(self):
+        if self.backup_scheduler is not None:
+            self.backup_scheduler.cancel()
+
     def change_password(self):
         dialog = ChangePasswordDialog(self.db, self.profile_id)
         dialog.exec_()
 
     def create_backup(self):
-        backup_path = self.db.backup_db()
-        QMessageBox.information(self, "Успех", f"Резервная копия создана: {backup_path}")
+        if self.backup_scheduler is None:
+            self.backup_finished(self.db.backup_db(), manual=True)
+            return
+        if not self.backup_scheduler.start():
+            QMessageBox.information(self, "Резервная копия", "Резервная копия уже создаётся")
+            return
+        self._manual_backup = True
 
-    def restore_db(self):
+    def backup_finished(self, snapshot, manual=False):
+        self.show_backup_running(False)
+        self.backup_status.setText(f"Последняя резервная копия: {snapshot['id']}")
+        if manual or self._manual_backup:
+            self._manual_backup = False
+            QMessageBox.information(
+                self, "Успех",
+                f"Резервная копия {snapshot['id']} создана: записано "
+                f"{snapshot['stored'] / 1048576:.1f} из {snapshot['size'] / 1048576:.1f} МБ"
+            )
+
+    def backup_failed(self, message):
+        self.show_backup_running(False)
+        self.backup_status.setText("")
+        if self._manual_backup:
+            self._manual_backup = False
+            QMessageBox.warning(self, "Ошибка", f"Не удалось создать резервную копию: {message}")
+
+    def backup_cancelled(self):
+        self._manual_backup = False
+        self.show_backup_running(False)
+        self.backup_status.setText("Резервное копирование отменено")
+
+    def choose_backup(self):
+        """
+        Выбор снимка из хранилища или файла полной копии (копии прежних версий).
+        Возвращает ("snapshot", id), ("file", путь) или None.
+        """
+        snapshots = self.db.backups.snapshots()[::-1]
+        items = [f"{s['created'].replace('T', ' ')}  ({s['size'] / 1048576:.1f} МБ)  {s['note']}" for s in snapshots]
+        items.append(FILE_BACKUP_ITEM)
+        item, ok = QInputDialog.getItem(self, "Восстановление", "Резервная копия:", items, 0, False)
+        if not ok:
+            return None
+        if item != FILE_BACKUP_ITEM:
+            return "snapshot", snapshots[items.index(item)]["id"]
         # Диалог для выбора файла резервной копии
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Выбрать резервную копию", "backups/",
             "SQLite Database Files (*.db)"
         )
-        if not file_path:
+        return ("file", file_path) if file_path else None
+
+    def restore_db(self):
+        choice = self.choose_backup()
+        if choice is None:
             return
 
         # Подтверждение действия
@@ -84,22 +184,42 @@ class SettingsTab(QWidget):
         if reply == QMessageBox.No:
             return
 
+        # Старые копии обновляются миграциями, показываем ход обновления схемы
+        progress_dialog = QProgressDialog("Восстановление базы данных...", None, 0, 100, self)
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(500)
+
+        def report(title, fraction):
+            progress_dialog.setLabelText(title)
+            progress_dialog.setValue(int(fraction * 100))
+            QApplication.processEvents()
+
+        # Пока база закрыта или обновляется, события обрабатываются только для окна прогресса:
+        # таймеры загрузки вкладок и снимков не должны срабатывать
+        self.restore_running.emit(True)
         try:
             # Вызываем метод восстановления из класса Database
-            self.db.restore_db(file_path)
+            kind, source = choice
+            if kind == "snapshot":
+                self.db.restore_snapshot(source, progress=report)
+            else:
+                self.db.restore_db(source, progress=report)
+            progress_dialog.close()
             QMessageBox.information(self, "Успех", "База данных успешно восстановлена")
             # Сигнализируем об обновлении данных
-            from main_window import MainWindow
-            if isinstance(self.parent().parent(), MainWindow):
-                self.parent().parent().data_updated.emit()
+            self.database_restored.emit()
         except Exception as e:
+            progress_dialog.close()
             QMessageBox.warning(self, "Ошибка", f"Не удалось восстановить базу данных: {str(e)}")
+        finally:
+            self.restore_running.emit(False)
 
 class ChangePasswordDialog(QDialog):
     def __init__(self, db, profile_id):
         super().__init__()
         self.db = db
         self.profile_id = profile_id
+        self.runner = TaskRunner(self)
         self.init_ui()
 
     def init_ui(self):
@@ -119,14 +239,18 @@ class ChangePasswordDialog(QDialog):
         layout.addRow("Подтвердите новый пароль:", self.confirm_password_input)
 
         button_layout = QHBoxLayout()
-        save_btn = QPushButton("Сохранить")
-        cancel_btn = QPushButton("Отмена")
-        button_layout.addWidget(save_btn)
-        button_layout.addWidget(cancel_btn)
+        self.save_btn = QPushButton("Сохранить")
+        self.cancel_btn = QPushButton("Отмена")
+        button_layout.addWidget(self.save_btn)
+        button_layout.addWidget(self.cancel_btn)
         layout.addRow(button_layout)
 
-        save_btn.clicked.connect(self.save)
-        cancel_btn.clicked.connect(self.reject)
+        # Индикатор проверки пароля
+        self.status_label = QLabel()
+        layout.addRow(self.status_label)
+
+        self.save_btn.clicked.connect(self.save)
+        self.cancel_btn.clicked.connect(self.reject)
 
         self.setLayout(layout)
 
@@ -142,15 +266,44 @@ class ChangePasswordDialog(QDialog):
             QMessageBox.warning(self, "Ошибка", "Новые пароли не совпадают")
             return
 
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT password FROM profiles WHERE id = ?", (self.profile_id,))
-            stored_password = cursor.fetchone()[0]
-            if not bcrypt.checkpw(old_password.encode('utf-8'), stored_password):
-                QMessageBox.warning(self, "Ошибка", "Неверный старый пароль")
-                return
-            hashed = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-            cursor.execute("UPDATE profiles SET password = ? WHERE id = ?", (hashed, self.profile_id))
-            conn.commit()
-            QMessageBox.information(self, "Успех", "Пароль изменён")
-            self.accept()
\ No newline at end of file
+        if self.runner.busy:
+            return
+        stored_password = self.db.password_hash(profile_id=self.profile_id)[1]
+        rounds = self.db.password_rounds
+
+        def rehash():
+            # Проверка старого пароля и хеширование нового выполняются в фоновом потоке
+            if not verify_password(old_password, stored_password):
+                return None
+            return hash_password(new_password, rounds)
+
+        self.set_busy(True)
+        self.runner.submit(rehash, self.password_hashed, self.task_failed)
+
+    def set_busy(self, busy):
+        for widget in (self.old_password_input, self.new_password_input,
+                       self.confirm_password_input, self.save_btn, self.cancel_btn):
+            widget.setEnabled(not busy)
+        self.status_label.setText("Проверка пароля…" if busy else "")
+        if busy:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+        else:
+            QApplication.restoreOverrideCursor()
+
+    def password_hashed(self, hashed):
+        self.set_busy(False)
+        if hashed is None:
+            QMessageBox.warning(self, "Ошибка", "Неверный старый пароль")
+            return
+        self.db.set_password_hash(self.profile_id, hashed)
+        QMessageBox.information(self, "Успех", "Пароль изменён")
+        self.accept()
+
+    def task_failed(self, message):
+        self.set_busy(False)
+        QMessageBox.warning(self, "Ошибка", f"Не удалось изменить пароль: {message}")
+
+    def reject(self):
+        if self.runner.busy:
+            return
+        super().reject()
\ No newline at end of file
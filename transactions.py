@@ -1,17 +1,224 @@
 # transactions.py
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton, QComboBox,
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableView, QHeaderView, QPushButton, QComboBox,
                              QLineEdit, QDateEdit, QLabel, QMenu, QDialog, QFormLayout, QMessageBox, QSizePolicy)
-from PyQt5.QtCore import Qt, QDate, QTimer, pyqtSignal
+from PyQt5.QtCore import Qt, QDate, QTimer, pyqtSignal, QAbstractTableModel, QModelIndex
 from PyQt5.QtGui import QFont
 import sqlite3
+from array import array
+from repository import TransactionRepository, UNCATEGORIZED_ID
+from workers import QueryExecutor
+from units import to_kopecks, from_kopecks, format_amount, day_to_date
+from periods import PeriodFilter, TRANSACTION_PERIODS
+
+class TransactionsModel(QAbstractTableModel):
+    """
+    Модель списка операций. Строки хранятся по столбцам в компактных массивах,
+    текст ячеек формируется в data() только для видимых строк.
+    """
+    HEADERS = ["Дата", "Категория", "Тип", "Сумма", "Описание"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._reset_storage()
+        self._fetch_page = None
+        self._after = None
+        self._loading = False
+        self._pending_reset = False
+        self.filters = {}
+
+    def _reset_storage(self):
+        self.ids = array('q')
+        self.days = array('l')
+        self.category_ids = array('q')
+        self.incomes = array('b')
+        self.amounts = array('q')
+        self.descriptions = []
+        self.category_names = {}
+
+    def _append_rows(self, rows):
+        for id_, day, category_id, category, type_, amount, desc, *_ in rows:
+            self.ids.append(id_)
+            self.days.append(day)
+            self.category_ids.append(category_id)
+            self.category_names[category_id] = category
+            self.incomes.append(type_ == "Доход")
+            self.amounts.append(amount)
+            self.descriptions.append(desc)
+
+    def _insert_row(self, position, row):
+        id_, day, category_id, category, type_, amount, desc = row
+        self.beginInsertRows(QModelIndex(), position, position)
+        self.ids.insert(position, id_)
+        self.days.insert(position, day)
+        self.category_ids.insert(position, category_id)
+        self.category_names[category_id] = category
+        self.incomes.insert(position, type_ == "Доход")
+        self.amounts.insert(position, amount)
+        self.descriptions.insert(position, desc)
+        self.endInsertRows()
+
+    def _remove_row(self, position):
+        self.beginRemoveRows(QModelIndex(), position, position)
+        for column in (self.ids, self.days, self.category_ids, self.incomes, self.amounts, self.descriptions):
+            del column[position]
+        self.endRemoveRows()
+
+    def row(self, position):
+        """Строка в формате TransactionRepository.list"""
+        category_id = self.category_ids[position]
+        return (
+            self.ids[position], self.days[position], category_id, self.category_names.get(category_id, ""),
+            "Доход" if self.incomes[position] else "Расход", self.amounts[position], self.descriptions[position]
+        )
+
+    def matches(self, row):
+        """Проходит ли строка текущие фильтры списка"""
+        _, day, category_id, _, type_, _, _ = row
+        filters = self.filters
+        # Список строится с JOIN categories: операции без категории в нём не показываются
+        if category_id == UNCATEGORIZED_ID:
+            return False
+        if filters.get("type_") and type_ != filters["type_"]:
+            return False
+        if filters.get("category_id") is not None and category_id != filters["category_id"]:
+            return False
+        if filters.get("start_day") is not None and day < filters["start_day"]:
+            return False
+        if filters.get("end_day") is not None and day >= filters["end_day"]:
+            return False
+        return True
+
+    def _follows(self, key, other):
+        """Идёт ли ключ key после other в порядке ORDER BY запроса"""
+        return key < other if self.filters.get("descending", False) else key > other
+
+    def _position_for(self, key):
+        """Позиция строки с ключом key в загруженной части списка"""
+        sort = self.filters.get("sort")
+        low, high = 0, len(self.ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self._follows(TransactionRepository.page_key(self.row(middle), sort), key):
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def apply_change(self, change):
+        """
+        Обновляет одну строку по TransactionChange без повторного запроса.
+        Возвращает False, если изменение нельзя применить на месте
+        (идёт загрузка или действует текстовый поиск) и нужна перезагрузка.
+        """
+        if self._loading or self.filters.get("search"):
+            return False
+        if change.old is not None:
+            try:
+                self._remove_row(self.ids.index(change.transaction_id))
+            except ValueError:
+                pass
+        if change.new is not None and self.matches(change.new):
+            key = TransactionRepository.page_key(change.new, self.filters.get("sort"))
+            # Строки за последней загруженной страницей придут со следующими страницами
+            if self._fetch_page is None or not self._follows(key, self._after):
+                self._insert_row(self._position_for(key), change.new)
+        return True
+
+    def set_source(self, fetch_page, filters=None):
+        """
+        Переключает модель на новый набор строк с постраничной загрузкой.
+        fetch_page(after, on_page) запрашивает страницу после ключа after и
+        вызывает on_page((строки, ключ последней строки)), когда она готова;
+        filters — параметры запроса, по которым модель применяет изменения строк.
+        Текущие строки остаются на экране до прихода первой страницы,
+        остальные страницы подгружаются через fetchMore по мере прокрутки.
+        """
+        self._fetch_page = fetch_page
+        self.filters = filters or {}
+        self._after = None
+        self._loading = True
+        self._pending_reset = True
+        fetch_page(None, self._receive_page)
+
+    def _receive_page(self, page):
+        rows, self._after = page
+        self._loading = False
+        if self._pending_reset:
+            self._pending_reset = False
+            self.beginResetModel()
+            self._reset_storage()
+            self._append_rows(rows)
+            self.endResetModel()
+        elif rows:
+            first = len(self.ids)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._append_rows(rows)
+            self.endInsertRows()
+        if not rows:
+            self._fetch_page = None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._fetch_page is not None and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        self._loading = True
+        self._fetch_page(self._after, self._receive_page)
+
+    def transaction_id(self, row):
+        return self.ids[row] if 0 <= row < len(self.ids) else None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if role == Qt.DisplayRole:
+            if column == 0:
+                return day_to_date(self.days[row]).isoformat()
+            if column == 1:
+                return self.category_names.get(self.category_ids[row], "")
+            if column == 2:
+                return "Доход" if self.incomes[row] else "Расход"
+            if column == 3:
+                amount = self.amounts[row]
+                rubles = from_kopecks(amount)
+                return f"{rubles:+.2f} ₽" if self.incomes[row] else f"{-rubles:.2f} ₽" if amount else "0.00 ₽"
+            if column == 4:
+                return self.descriptions[row] or ""
+        elif role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        elif role == Qt.UserRole:
+            # transaction_id в первом столбце и числовое значение суммы
+            if column == 0:
+                return self.ids[row]
+            if column == 3:
+                return from_kopecks(self.amounts[row])
+        return None
+
 
 class TransactionsTab(QWidget):
-    transaction_updated = pyqtSignal()  # Сигнал для уведомления об изменениях операций
+    transaction_updated = pyqtSignal(object)  # Сигнал с TransactionChange об изменении операции
 
     def __init__(self, db, profile_id):
         super().__init__()
         self.db = db
         self.profile_id = profile_id
+        self.transactions = TransactionRepository(db)
+        self.categories = db.category_cache(profile_id)
+        self.categories.add_listener(self.update_categories)
+        self.executor = QueryExecutor(db, self)
         self.table = None
         self.sort_column = -1
         self.sort_order = Qt.AscendingOrder
@@ -168,10 +375,11 @@ class TransactionsTab(QWidget):
         # Добавляем промежуточный макет в основной макет
         main_layout.addLayout(filter_search_layout)
 
-        # Таблица
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["Дата", "Категория", "Тип", "Сумма", "Описание"])
+        # Таблица: модель хранит строки по столбцам и форматирует только видимые ячейки
+        self.model = TransactionsModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QTableView.SelectRows)
         print("Table created:", self.table)
 
         # Увеличение шрифта для таблицы
@@ -179,12 +387,18 @@ class TransactionsTab(QWidget):
         table_font.setPointSize(14)
         self.table.setFont(table_font)
         self.table.horizontalHeader().setFont(table_font)
+        # Фиксированная высота строк избавляет представление от измерения каждой строки
         self.table.verticalHeader().setDefaultSectionSize(40)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         self.table.setContextMenuPolicy(Qt.CustomContextMenu)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
-        self.table.setSortingEnabled(True)
-        self.table.horizontalHeader().setStretchLastSection(True)
-        self.table.horizontalHeader().sectionClicked.connect(self.handle_sort)
+        # Сортировка выполняется в SQL, поэтому встроенная сортировка представления отключена
+        header = self.table.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(False)
+        header.setStretchLastSection(True)
+        header.setSectionResizeMode(QHeaderView.Stretch)
+        header.sectionClicked.connect(self.handle_sort)
 
         main_layout.addWidget(self.table)
 
@@ -205,17 +419,8 @@ class TransactionsTab(QWidget):
         self.category_combo.clear()
         self.category_combo.addItem("Все")
         type_ = self.type_combo.currentText()
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            if type_ == "Все":
-                cursor.execute("SELECT id, name FROM categories WHERE profile_id = ?", (self.profile_id,))
-            else:
-                cursor.execute(
-                    "SELECT id, name FROM categories WHERE profile_id = ? AND type = ?",
-                    (self.profile_id, type_)
-                )
-            for cat_id, name in cursor.fetchall():
-                self.category_combo.addItem(name, cat_id)
+        for cat_id, name, _ in self.categories.list(None if type_ == "Все" else type_):
+            self.category_combo.addItem(name, cat_id)
         # Запускаем обновление через таймер
         self.load_timer.start(300)
 
@@ -235,148 +440,93 @@ class TransactionsTab(QWidget):
         self.date_to.setVisible(False)
         self.load_transactions()
 
-    def load_transactions(self):
-        if not hasattr(self, 'table') or self.table is None:
-            print("Error: Table not initialized")
-            return
-
-        # Сохраняем текущие параметры сортировки
-        sort_column = self.sort_column
-        sort_order = self.sort_order
-
-        # Отключаем обновления и сортировку
-        self.table.setUpdatesEnabled(False)
-        self.table.setSortingEnabled(False)
-
-        # Очищаем таблицу
-        self.table.setRowCount(0)
-
-        # Формируем SQL-запрос
-        query = """
-            SELECT t.id, t.date, c.name, t.type, t.amount, t.description
-            FROM transactions t
-            JOIN categories c ON t.category_id = c.id
-            WHERE t.profile_id = ?
-        """
-        params = [self.profile_id]
-
-        # Фильтры
+    def current_filters(self):
+        """Фильтры списка операций в виде аргументов TransactionRepository.list"""
+        filters = {}
         if self.type_combo.currentText() != "Все":
-            query += " AND t.type = ?"
-            params.append(self.type_combo.currentText())
+            filters["type_"] = self.type_combo.currentText()
 
-        category_text = self.category_combo.currentText()
-        if category_text != "Все":
+        if self.category_combo.currentText() != "Все":
             category_id = self.category_combo.itemData(self.category_combo.currentIndex())
             if category_id is not None:  # Проверка на валидность category_id
-                query += " AND c.id = ?"
-                params.append(category_id)
+                filters["category_id"] = category_id
 
         search_text = self.search_input.text()
         if search_text:
-            query += " AND t.description LIKE ?"
-            params.append(f"%{search_text}%")
-
-        period = self.period_combo.currentText()
-        if period == "Произвольный":
-            query += " AND t.date BETWEEN ? AND ?"
-            params.extend([self.date_from.date().toString("yyyy-MM-dd"), self.date_to.date().toString("yyyy-MM-dd")])
-        elif period == "Месяц":
-            query += " AND t.date >= date('now', '-1 month')"
-        elif period == "Неделя":
-            query += " AND t.date >= date('now', '-7 days')"
-        elif period == "Год":
-            query += " AND t.date >= date('now', '-1 year')"
-
-        # Добавляем сортировку в SQL
-        column_map = {
-            0: "t.date",
-            1: "c.name",
-            2: "t.type",
-            3: "t.amount",
-            4: "t.description"
-        }
-        if sort_column in column_map:
-            query += f" ORDER BY {column_map[sort_column]} {'ASC' if sort_order == Qt.AscendingOrder else 'DESC'}"
+            filters["search"] = search_text
 
-        try:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, params)
-                data = cursor.fetchall()
-                for row, (id_, date, category, type_, amount, desc) in enumerate(data):
-                    self.table.insertRow(row)
-                    self.table.setItem(row, 0, QTableWidgetItem(str(date) if date else ""))
-                    self.table.setItem(row, 1, QTableWidgetItem(str(category) if category else ""))
-                    self.table.setItem(row, 2, QTableWidgetItem(str(type_) if type_ else ""))
-                    amount_str = f"{amount:+.2f} ₽" if type_ == "Доход" else f"{-amount:.2f} ₽" if amount else "0.00 ₽"
-                    amount_item = QTableWidgetItem(amount_str)
-                    # Сохраняем числовое значение суммы для корректной сортировки
-                    amount_item.setData(Qt.UserRole, float(amount))
-                    self.table.setItem(row, 3, amount_item)
-                    self.table.setItem(row, 4, QTableWidgetItem(str(desc) if desc else ""))
-                    self.table.setRowHeight(row, 40)
-                    for col in range(5):
-                        self.table.item(row, col).setTextAlignment(Qt.AlignCenter)
-                    # Привязываем transaction_id к строке
-                    item = self.table.item(row, 0)
-                    if item:
-                        item.setData(Qt.UserRole, id_)
-
-                header = self.table.horizontalHeader()
-                for i in range(self.table.columnCount()):
-                    header.setSectionResizeMode(i, header.Stretch)
+        period = PeriodFilter.from_label(
+            self.period_combo.currentText(), TRANSACTION_PERIODS,
+            self.date_from.date().toPyDate(), self.date_to.date().toPyDate()
+        )
+        filters["start_day"], filters["end_day"] = period.bounds()
+        return filters
 
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "Ошибка", f"Ошибка базы данных: {str(e)}")
-        finally:
-            # Восстанавливаем сортировку и обновления
-            self.table.setSortingEnabled(True)
-            self.table.setUpdatesEnabled(True)
-            if sort_column >= 0:
-                self.table.sortItems(sort_column, sort_order)
+    def load_transactions(self):
+        if not hasattr(self, 'table') or self.table is None:
+            print("Error: Table not initialized")
+            return
+
+        # Сортировка выполняется в SQL
+        sort_keys = ["date", "category", "type", "amount", "description"]
+        sort = sort_keys[self.sort_column] if 0 <= self.sort_column < len(sort_keys) else None
+
+        filters = self.current_filters()
+        filters["sort"] = sort
+        filters["descending"] = self.sort_order == Qt.DescendingOrder
+        profile_id = self.profile_id
+
+        def fetch_page(after, on_page):
+            # Запрос выполняется в фоне; новый вызов load_transactions вытесняет незавершённый
+            self.executor.submit(
+                lambda db: TransactionRepository(db).page(profile_id, after=after, **filters),
+                on_page, self.show_load_error
+            )
+
+        self.model.set_source(fetch_page, filters)
+
+    def show_load_error(self, message):
+        QMessageBox.critical(self, "Ошибка", f"Ошибка базы данных: {message}")
 
     def show_context_menu(self, pos):
         menu = QMenu()
         edit_action = menu.addAction("✏️ Редактировать")
         delete_action = menu.addAction("🗑️ Удалить")
         action = menu.exec_(self.table.mapToGlobal(pos))
-        row = self.table.currentRow()
+        row = self.table.currentIndex().row()
         if row < 0:
             return
-        # Извлекаем transaction_id из данных ячейки
-        transaction_id = self.table.item(row, 0).data(Qt.UserRole)
+        # Извлекаем transaction_id из модели
+        transaction_id = self.model.transaction_id(row)
         if action == edit_action:
             self.edit_transaction(row)
         elif action == delete_action:
             self.delete_transaction(transaction_id)
 
+    def apply_change(self, change):
+        # Меняется одна строка таблицы; полная перезагрузка только если модель не может применить изменение
+        if not self.model.apply_change(change):
+            self.load_transactions()
+        self.transaction_updated.emit(change)
+
     def add_transaction(self):
         dialog = TransactionDialog(self.db, self.profile_id)
         if dialog.exec_():
-            self.load_transactions()
-            self.transaction_updated.emit()  # Вызываем сигнал
+            self.apply_change(dialog.change)
 
     def edit_transaction(self, row):
-        transaction_id = self.table.item(row, 0).data(Qt.UserRole)
+        transaction_id = self.model.transaction_id(row)
         if transaction_id is None:
             return
         dialog = TransactionDialog(self.db, self.profile_id, transaction_id)
         if dialog.exec_():
-            self.load_transactions()
-            self.transaction_updated.emit()  # Вызываем сигнал
+            self.apply_change(dialog.change)
 
     def delete_transaction(self, transaction_id):
         if transaction_id is None:
             return
         if QMessageBox.question(self, "Подтверждение", "Удалить операцию?") == QMessageBox.Yes:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM transactions WHERE id = ? AND profile_id = ?",
-                               (transaction_id, self.profile_id))
-                conn.commit()
-            self.load_transactions()
-            self.transaction_updated.emit()  # Вызываем сигнал
+            self.apply_change(self.transactions.delete(self.profile_id, transaction_id))
 
     def handle_sort(self, logical_index):
         if self.sort_column == logical_index:
@@ -384,6 +534,9 @@ class TransactionsTab(QWidget):
         else:
             self.sort_column = logical_index
             self.sort_order = Qt.AscendingOrder
+        header = self.table.horizontalHeader()
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(self.sort_column, self.sort_order)
         self.load_timer.start(300)
 
 
@@ -393,6 +546,9 @@ class TransactionDialog(QDialog):
         self.db = db
         self.profile_id = profile_id
         self.transaction_id = transaction_id
+        self.change = None  # TransactionChange после сохранения
+        self.transactions = TransactionRepository(db)
+        self.categories = db.category_cache(profile_id)
         self.init_ui()
 
     def init_ui(self):
@@ -471,36 +627,23 @@ class TransactionDialog(QDialog):
 
         # Загрузка данных для редактирования
         if self.transaction_id:
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT date, category_id, type, amount, description "
-                    "FROM transactions WHERE id = ? AND profile_id = ?",
-                    (self.transaction_id, self.profile_id)
-                )
-                data = cursor.fetchone()
-                if data:
-                    date, cat_id, type_, amount, desc = data
-                    self.date_input.setDate(QDate.fromString(date, "yyyy-MM-dd"))
-                    self.type_combo.setCurrentText(type_)
-                    self.update_categories()
-                    self.category_combo.setCurrentIndex(self.category_combo.findData(cat_id))
-                    self.amount_input.setText(str(amount))
-                    self.desc_input.setText(desc or "")
+            data = self.transactions.get(self.profile_id, self.transaction_id)
+            if data:
+                date, cat_id, type_, amount, desc = data
+                self.date_input.setDate(QDate.fromString(date, "yyyy-MM-dd"))
+                self.type_combo.setCurrentText(type_)
+                self.update_categories()
+                self.category_combo.setCurrentIndex(self.category_combo.findData(cat_id))
+                self.amount_input.setText(format_amount(amount))
+                self.desc_input.setText(desc or "")
 
         self.setLayout(layout)
 
     def update_categories(self):
         self.category_combo.clear()
         type_ = self.type_combo.currentText()
-        with sqlite3.connect(self.db.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT id, name FROM categories WHERE profile_id = ? AND type = ?",
-                (self.profile_id, type_)
-            )
-            for cat_id, name in cursor.fetchall():
-                self.category_combo.addItem(name, cat_id)
+        for cat_id, name, _ in self.categories.list(type_):
+            self.category_combo.addItem(name, cat_id)
 
     def save(self):
         try:
@@ -509,10 +652,10 @@ class TransactionDialog(QDialog):
             if not amount_text:
                 raise ValueError("Поле 'Сумма' не может быть пустым")
 
-            # Пытаемся преобразовать в число
+            # Пытаемся преобразовать в число копеек
             try:
-                amount = float(amount_text)
-            except ValueError:
+                amount = to_kopecks(amount_text)
+            except (ArithmeticError, ValueError):
                 raise ValueError("Введите корректное положительное число в поле 'Сумма'")
 
             # Проверяем, что сумма положительная
@@ -524,22 +667,13 @@ class TransactionDialog(QDialog):
             type_ = self.type_combo.currentText()
             description = self.desc_input.text() or None
 
-            with sqlite3.connect(self.db.db_path) as conn:
-                cursor = conn.cursor()
-                if self.transaction_id:
-                    cursor.execute(
-                        "UPDATE transactions SET date = ?, category_id = ?, type = ?, amount = ?, description = ? "
-                        "WHERE id = ? AND profile_id = ?",
-                        (date, category_id, type_, amount, description, self.transaction_id, self.profile_id)
-                    )
-                else:
-                    cursor.execute(
-                        "INSERT INTO transactions (profile_id, date, category_id, type, amount, description) "
-                        "VALUES (?, ?, ?, ?, ?, ?)",
-                        (self.profile_id, date, category_id, type_, amount, description)
-                    )
-                conn.commit()
-                self.accept()
+            if self.transaction_id:
+                self.change = self.transactions.update(
+                    self.profile_id, self.transaction_id, date, category_id, type_, amount, description
+                )
+            else:
+                self.change = self.transactions.insert(self.profile_id, date, category_id, type_, amount, description)
+            self.accept()
         except ValueError as e:
             QMessageBox.warning(self, "Ошибка", str(e))
         except sqlite3.Error as e:
@@ -0,0 +1,56 @@
+# units.py
+"""
+Единицы хранения: суммы хранятся целым числом копеек, даты операций —
+номером дня (date.toordinal), по которому строятся индексы и диапазоны.
+"""
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+# Смещение между julianday() в SQLite и date.toordinal() в Python
+JULIAN_DAY_OFFSET = 1721424.5
+
+
+def to_kopecks(amount):
+    """Переводит сумму в рублях (число или строку) в целое число копеек."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_kopecks(kopecks):
+    """Переводит копейки в рубли для отображения и экспорта."""
+    return (kopecks or 0) / 100
+
+
+def format_amount(kopecks):
+    return f"{from_kopecks(kopecks):.2f}"
+
+
+def day_number(value):
+    """Номер дня для даты или строки формата yyyy-MM-dd."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+
+def day_to_date(day):
+    return date.fromordinal(day)
+
+
+def date_bounds(date_from, date_to):
+    """Полуоткрытый диапазон дней [date_from, date_to + 1) для включительного интервала дат."""
+    return day_number(date_from), day_number(date_to) + 1
+
+
+def month_bounds(year, month):
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start.toordinal(), end.toordinal()
+
+
+def year_bounds(year):
+    return date(year, 1, 1).toordinal(), date(year + 1, 1, 1).toordinal()
+
+
+def week_bounds(day):
+    """Неделя с понедельника, содержащая указанную дату."""
+    start = day - timedelta(days=day.weekday())
+    return start.toordinal(), start.toordinal() + 7
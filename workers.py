@@ -0,0 +1,339 @@
+# workers.py
+"""
+Фоновое выполнение запросов вкладок.
+
+QueryExecutor выполняет запросы в отдельном потоке через собственное
+соединение только для чтения, поэтому интерфейс не замирает во время
+долгого поиска. Каждый запрос получает номер поколения: результаты
+запросов, вытесненных более новыми, отбрасываются, а выполняющийся
+устаревший оператор SQLite прерывается через Connection.interrupt().
+"""
+import threading
+from contextlib import contextmanager
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class ReaderDatabase:
+    """Обёртка над соединением читателя с интерфейсом Database.connection() для репозиториев."""
+
+    def __init__(self, conn, fulltext=False):
+        self._conn = conn
+        self.fulltext = fulltext
+
+    @contextmanager
+    def connection(self):
+        yield self._conn
+
+
+class _QueryTask(QRunnable):
+    def __init__(self, executor, generation, query):
+        super().__init__()
+        self.executor = executor
+        self.generation = generation
+        self.query = query
+
+    def run(self):
+        self.executor._run(self.generation, self.query)
+
+
+class QueryExecutor(QObject):
+    finished = pyqtSignal(int, object)  # поколение, результат
+    failed = pyqtSignal(int, str)  # поколение, текст ошибки
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.generation = 0
+        self._reader = None
+        self._running = None  # поколение выполняющегося запроса
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        # Один поток: соединение читателя никогда не используется параллельно
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.finished.connect(self._on_finished)
+        self.failed.connect(self._on_failed)
+
+    def submit(self, query, callback, errback=None):
+        """
+        Ставит запрос в очередь и вытесняет все предыдущие.
+        query(reader_db) выполняется в фоновом потоке и получает объект
+        с методом connection(), совместимый с репозиториями; callback(result)
+        и errback(message) вызываются в потоке интерфейса, только если
+        за это время не был отправлен более новый запрос.
+        """
+        if self._reader is None:
+            self._reader = self.db.open_reader(self)
+        self.generation += 1
+        self._callbacks = {self.generation: (callback, errback)}
+        with self._lock:
+            if self._running is not None:
+                self._reader.interrupt()
+        self.pool.start(_QueryTask(self, self.generation, query))
+        return self.generation
+
+    @property
+    def pending(self):
+        """Есть ли запрос, результат которого ещё не доставлен."""
+        return bool(self._callbacks)
+
+    def cancel(self):
+        """Отбрасывает результат текущего запроса и прерывает его выполнение."""
+        self.generation += 1
+        self._callbacks = {}
+        with self._lock:
+            if self._running is not None:
+                self._reader.interrupt()
+
+    def _run(self, generation, query):
+        # Запрос устарел, пока ждал в очереди
+        if generation != self.generation:
+            return
+        with self._lock:
+            self._running = generation
+        try:
+            result = query(ReaderDatabase(self._reader, self.db.fulltext))
+        except Exception as e:
+            self.failed.emit(generation, str(e))
+        else:
+            self.finished.emit(generation, result)
+        finally:
+            with self._lock:
+                self._running = None
+
+    def _on_finished(self, generation, result):
+        callbacks = self._callbacks.pop(generation, None)
+        if callbacks is not None:
+            callbacks[0](result)
+
+    def _on_failed(self, generation, message):
+        callbacks = self._callbacks.pop(generation, None)
+        if callbacks is None:
+            return
+        if callbacks[1] is not None:
+            callbacks[1](message)
+        else:
+            print(f"Ошибка фонового запроса: {message}")
+
+    def wait(self):
+        """Дожидается завершения запросов в очереди (для скриптов и закрытия базы)."""
+        self.pool.waitForDone()
+
+    def close_reader(self):
+        """Вызывается Database.close(): прерывает запросы и закрывает соединение читателя."""
+        self.cancel()
+        self.wait()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+class _ExportTask(QRunnable):
+    def __init__(self, worker, job):
+        super().__init__()
+        self.worker = worker
+        self.job = job
+
+    def run(self):
+        self.worker._run(self.job)
+
+
+class ExportWorker(QObject):
+    """
+    Выполняет экспорт в фоновом потоке через собственное соединение только
+    для чтения. job(conn, progress, cancelled) — функция экспорта
+    (например, exporters.export_transactions с подставленными аргументами).
+    """
+    progress = pyqtSignal(int, int)  # записано строк, всего строк
+    finished = pyqtSignal(int)  # число строк
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self._reader = None
+        self._cancel = threading.Event()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+
+    def start(self, job):
+        if self._reader is None:
+            self._reader = self.db.open_reader(self)
+        self._cancel.clear()
+        self.pool.start(_ExportTask(self, job))
+
+    def cancel(self):
+        """Останавливает экспорт после текущей порции строк."""
+        self._cancel.set()
+
+    def _run(self, job):
+        # exporters не импортируется при загрузке модуля: workers нужен уже окну входа
+        from exporters import ExportCancelled
+
+        try:
+            count = job(self._reader, self.progress.emit, self._cancel.is_set)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(count)
+
+    def wait(self):
+        self.pool.waitForDone()
+
+    def close_reader(self):
+        """Вызывается Database.close(): отменяет экспорт и закрывает соединение читателя."""
+        self.cancel()
+        self.wait()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+class _Task(QRunnable):
+    def __init__(self, runner, task):
+        super().__init__()
+        self.runner = runner
+        self.task = task
+
+    def run(self):
+        self.runner._run(self.task)
+
+
+class TaskRunner(QObject):
+    """
+    Выполняет вычисления без обращения к базе (хеширование паролей bcrypt)
+    в фоновом потоке. task() выполняется в потоке пула, callback(result)
+    и errback(message) вызываются в потоке интерфейса.
+    """
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._callbacks = None
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.finished.connect(self._on_finished)
+        self.failed.connect(self._on_failed)
+
+    @property
+    def busy(self):
+        return self._callbacks is not None
+
+    def submit(self, task, callback, errback=None):
+        self._callbacks = (callback, errback)
+        self.pool.start(_Task(self, task))
+
+    def _run(self, task):
+        try:
+            result = task()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(result)
+
+    def _on_finished(self, result):
+        callbacks, self._callbacks = self._callbacks, None
+        if callbacks is not None:
+            callbacks[0](result)
+
+    def _on_failed(self, message):
+        callbacks, self._callbacks = self._callbacks, None
+        if callbacks is None:
+            return
+        if callbacks[1] is not None:
+            callbacks[1](message)
+        else:
+            print(f"Ошибка фоновой задачи: {message}")
+
+    def wait(self):
+        self.pool.waitForDone()
+
+
+class _BackupTask(QRunnable):
+    def __init__(self, worker, note):
+        super().__init__()
+        self.worker = worker
+        self.note = note
+
+    def run(self):
+        self.worker._run(self.note)
+
+
+class BackupWorker(QObject):
+    """
+    Создаёт снимок базы в фоновом потоке пошаговым backup API через
+    собственное соединение только для чтения (Database.backup_from).
+    После снимка там же удаляет старые снимки по политике retention.
+    """
+    progress = pyqtSignal(str, int, int)  # этап, сделано, всего
+    finished = pyqtSignal(object)  # манифест снимка
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, db, retention=None, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.retention = retention
+        self._reader = None
+        self._running = False
+        self._cancel = threading.Event()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        self.finished.connect(self._done)
+        self.failed.connect(self._done)
+        self.cancelled.connect(self._done)
+
+    @property
+    def busy(self):
+        return self._running
+
+    def start(self, note=""):
+        if self._running:
+            return False
+        if self._reader is None:
+            self._reader = self.db.open_reader(self)
+        self._running = True
+        self._cancel.clear()
+        self.pool.start(_BackupTask(self, note))
+        return True
+
+    def cancel(self):
+        """Останавливает копирование после текущего шага."""
+        self._cancel.set()
+
+    def _run(self, note):
+        from backup_store import BackupCancelled
+
+        try:
+            manifest = self.db.backup_from(self._reader, self.progress.emit, self._cancel.is_set, note)
+        except BackupCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            if self.retention is not None:
+                # Пока задача выполняется, новый снимок не начнётся и сборка мусора не заденет его блоки
+                try:
+                    self.db.backups.prune(self.retention)
+                except OSError as e:
+                    print(f"Ошибка очистки старых снимков: {e}")
+            self.finished.emit(manifest)
+
+    def _done(self, *args):
+        self._running = False
+
+    def wait(self):
+        self.pool.waitForDone()
+        self._running = False
+
+    def close_reader(self):
+        """Вызывается Database.close(): отменяет копирование и закрывает соединение читателя."""
+        self.cancel()
+        self.wait()
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None